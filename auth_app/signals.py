@@ -0,0 +1,18 @@
+from django.conf import settings
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from core.authentication import invalidate_cached_user
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+def user_changed(sender, instance, **kwargs):
+    """
+    Drop the cached user of the authentication backend on every save or delete, which covers
+    deactivation and staff changes. Saves of only last_login on login leave it in place.
+    """
+    if kwargs.get("update_fields") == frozenset({"last_login"}):
+        return
+
+    invalidate_cached_user(instance.pk)
@@ -3,6 +3,7 @@ from django.contrib.auth import get_user_model
 from django.core.mail import send_mail
 from django.urls import reverse
 from core.settings import env
+from core.utils.tasks import MAIL_RETRY
 
 import logging
 
@@ -10,7 +11,7 @@ User = get_user_model()
 logger = logging.getLogger(__name__)
 
 
-@job("default", timeout=300)
+@job("mail", timeout=60, retry=MAIL_RETRY)
 def send_activation_email(user_id, uid, token):
     """
     Send an activation email to the user after registration.
@@ -42,7 +43,7 @@ def send_activation_email(user_id, uid, token):
         raise
 
 
-@job("default", timeout=300)
+@job("mail", timeout=60, retry=MAIL_RETRY)
 def send_password_reset_email(email, reset_url):
     """
     Send a password reset email to the user.
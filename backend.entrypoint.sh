@@ -38,6 +38,12 @@ else:
     print(f"Superuser '{username}' already exists.")
 EOF
 
-python manage.py rqworker default &
+# One worker pool per queue (transcode, media, mail, default), sized by RQ_*_WORKERS
+python manage.py rqworker_pools &
+
+# SERVER_PROFILE=asgi: uvicorn event loop workers stream HLS without holding a worker per viewer
+if [ "$SERVER_PROFILE" = "asgi" ]; then
+  exec uvicorn core.asgi:application --host 0.0.0.0 --port 8000 --workers "${WEB_CONCURRENCY:-2}"
+fi
 
 exec gunicorn core.wsgi:application --bind 0.0.0.0:8000
@@ -1,7 +1,8 @@
 from django.contrib import admin
-from django.utils.html import format_html
+from django.utils.html import format_html, format_html_join
 
-from .models import Video, VideoQuality
+from .models import Video, VideoQuality, VideoMediaInfo, VideoUpload
+from .utils import progress
 import django_rq
 
 
@@ -20,7 +21,7 @@ class VideoAdminAdvanced(admin.ModelAdmin):
     list_filter = ["category", "created_at"]
     search_fields = ["title", "description"]
     ordering = ["-created_at"]
-    readonly_fields = ["video_preview", "thumbnail_preview", "file_info", "processing_info"]
+    readonly_fields = ["video_preview", "thumbnail_preview", "file_info", "media_info", "processing_info"]
 
     fieldsets = (
         ("Basic data", {"fields": ("title", "description", "category")}),
@@ -29,7 +30,7 @@ class VideoAdminAdvanced(admin.ModelAdmin):
             {"fields": ("video_file", "video_preview", "thumbnail_url", "thumbnail_preview"), "classes": ("wide",)},
         ),
         ("Processing", {"fields": ("processing_info",), "classes": ("collapse",)}),
-        ("Metadata", {"fields": ("created_at", "file_info"), "classes": ("collapse",)}),
+        ("Metadata", {"fields": ("created_at", "file_info", "media_info"), "classes": ("collapse",)}),
     )
 
     def video_preview(self, obj):
@@ -86,14 +87,66 @@ class VideoAdminAdvanced(admin.ModelAdmin):
 
     file_info.short_description = "File-information"
 
+    def media_info(self, obj):
+        try:
+            info = obj.media_info
+        except VideoMediaInfo.DoesNotExist:
+            return "Not probed yet"
+
+        return format_html(
+            "<strong>Container:</strong> {}<br>"
+            "<strong>Duration:</strong> {} s<br>"
+            "<strong>Video:</strong> {} {}x{} at {} fps, {} kbit/s<br>"
+            "<strong>Audio:</strong> {}<br>"
+            "<strong>Keyframe interval:</strong> {} s<br>"
+            "<strong>Complexity factor:</strong> {}",
+            info.format_name,
+            info.duration,
+            info.video_codec,
+            info.width,
+            info.height,
+            round(info.frame_rate, 3) if info.frame_rate else "?",
+            info.bitrate or "?",
+            info.audio_codec or "None",
+            info.keyframe_interval or "?",
+            info.complexity_factor or "Not measured",
+        )
+
+    media_info.short_description = "Media-information"
+
     def processing_info(self, obj):
-        queue = django_rq.get_queue("default")
-        job_count = len(queue.jobs)
+        job_count = sum(len(django_rq.get_queue(name).jobs) for name in ("media", "transcode"))
 
         return format_html(
-            "<strong>Queue status:</strong> {} Jobs in the queue<br>" "<strong>Thumbnail status:</strong> {}",
+            "<strong>Queue status:</strong> {} Jobs in the media and transcode queues<br>"
+            "<strong>Thumbnail status:</strong> {}<br>"
+            "<strong>Transcode status:</strong> {}<br>{}",
             job_count,
             "Available" if obj.thumbnail_url else "Not generated",
+            obj.processing_status,
+            self.transcode_progress(obj),
+        )
+
+    def transcode_progress(self, obj):
+        renditions = progress.get_video_progress(obj.id)
+        if not renditions:
+            return "No transcode progress available"
+
+        return format_html_join(
+            "<br>",
+            "<strong>{}:</strong> {} {}% at {}x realtime, {} fps on {}{}",
+            (
+                (
+                    rendition,
+                    info["status"],
+                    info.get("percent") if info.get("percent") is not None else "?",
+                    info.get("speed") if info.get("speed") is not None else "?",
+                    info.get("fps") if info.get("fps") is not None else "?",
+                    info["worker"],
+                    " (stalled)" if info["stalled"] else "",
+                )
+                for rendition, info in sorted(renditions.items())
+            ),
         )
 
     processing_info.short_description = "Processing status"
@@ -102,7 +155,7 @@ class VideoAdminAdvanced(admin.ModelAdmin):
 class VideoQualityAdmin(admin.ModelAdmin):
     """Admin interface for managing VideoQuality objects."""
 
-    list_display = ("video_title", "resolution", "bitrate", "processing_status")
+    list_display = ("video_title", "resolution", "width", "height", "bitrate", "processing_status")
     list_filter = ("processing_status", "resolution", "video__title")
     search_fields = ("video__title",)
 
@@ -114,3 +167,15 @@ class VideoQualityAdmin(admin.ModelAdmin):
 
 
 admin.site.register(VideoQuality, VideoQualityAdmin)
+
+
+class VideoUploadAdmin(admin.ModelAdmin):
+    """Admin interface for watching chunked uploads."""
+
+    list_display = ("filename", "user", "offset", "length", "status", "video", "created_at")
+    list_filter = ("status",)
+    search_fields = ("filename", "title")
+    readonly_fields = ("id", "file_name", "offset", "video", "created_at", "updated_at")
+
+
+admin.site.register(VideoUpload, VideoUploadAdmin)
@@ -1,5 +1,18 @@
+from django.conf import settings
 from rest_framework import serializers
-from content.models import Video
+from content.models import Video, VideoMediaInfo, VideoUpload
+from content.utils import progress, uploads, video_processing
+
+
+class VideoMediaInfoSerializer(serializers.ModelSerializer):
+    """
+    Serializer for the probed media information of a video
+    """
+
+    class Meta:
+        model = VideoMediaInfo
+        fields = ["duration", "width", "height", "frame_rate", "video_codec", "audio_codec", "has_audio"]
+        read_only_fields = fields
 
 
 class VideoListSerializer(serializers.ModelSerializer):
@@ -7,7 +20,64 @@ class VideoListSerializer(serializers.ModelSerializer):
     Serializer for Video list view - returns basic information only
     """
 
+    media_info = VideoMediaInfoSerializer(read_only=True)
+    trickplay_url = serializers.SerializerMethodField()
+
     class Meta:
         model = Video
-        fields = ["id", "created_at", "title", "description", "thumbnail_url", "category"]
-        read_only_fields = ["id", "created_at"]
+        fields = [
+            "id",
+            "created_at",
+            "title",
+            "description",
+            "thumbnail_url",
+            "category",
+            "duration",
+            "media_info",
+            "trickplay_url",
+        ]
+        read_only_fields = ["id", "created_at", "duration"]
+
+    def get_trickplay_url(self, obj):
+        if not obj.has_trickplay:
+            return None
+        return f"/api/video/{obj.id}/trickplay/{video_processing.TRICKPLAY_VTT}"
+
+
+class VideoProgressSerializer(serializers.ModelSerializer):
+    """
+    Serializer for the transcode progress of a video
+    """
+
+    renditions = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Video
+        fields = ["id", "title", "processing_status", "renditions"]
+
+    def get_renditions(self, obj):
+        return progress.get_video_progress(obj.id)
+
+
+class VideoUploadSerializer(serializers.ModelSerializer):
+    """
+    Serializer for a resumable chunked upload
+    """
+
+    class Meta:
+        model = VideoUpload
+        fields = ["id", "title", "description", "category", "filename", "length", "offset", "status", "video"]
+        read_only_fields = ["id", "offset", "status", "video"]
+
+    def validate_length(self, value):
+        if value < 1:
+            raise serializers.ValidationError("Empty uploads are not accepted.")
+        if value > settings.VIDEO_UPLOAD_MAX_SIZE:
+            raise serializers.ValidationError(f"Uploads are limited to {settings.VIDEO_UPLOAD_MAX_SIZE} bytes.")
+        return value
+
+    def create(self, validated_data):
+        upload = VideoUpload(**validated_data)
+        upload.file_name = uploads.get_upload_file_name(upload)
+        upload.save()
+        return upload
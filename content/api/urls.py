@@ -1,8 +1,11 @@
 from django.urls import path
-from .views import VideoListView
+from .views import VideoListView, VideoProgressView, VideoUploadCreateView, VideoUploadDetailView
 
 app_name = "content-api"
 
 urlpatterns = [
     path("", VideoListView.as_view(), name="video-list"),
+    path("<int:pk>/progress/", VideoProgressView.as_view(), name="video-progress"),
+    path("uploads/", VideoUploadCreateView.as_view(), name="video-upload-create"),
+    path("uploads/<uuid:pk>/", VideoUploadDetailView.as_view(), name="video-upload-detail"),
 ]
@@ -1,7 +1,9 @@
-from rest_framework import generics, permissions
+from rest_framework import generics, permissions, status
+from rest_framework.response import Response
 
-from content.api.serializers import VideoListSerializer
-from content.models import Video
+from content.api.serializers import VideoListSerializer, VideoProgressSerializer, VideoUploadSerializer
+from content.models import Video, VideoUpload
+from content.utils import uploads
 
 
 class VideoListView(generics.ListAPIView):
@@ -9,7 +11,95 @@ class VideoListView(generics.ListAPIView):
     Returns list of all videos with basic information
     """
 
-    queryset = Video.objects.all()
+    queryset = Video.objects.select_related("media_info")
     serializer_class = VideoListSerializer
 
     permission_classes = [permissions.IsAuthenticated]
+
+
+class VideoProgressView(generics.RetrieveAPIView):
+    """
+    Returns the live transcode progress (out_time, fps, speed) of every rendition
+    """
+
+    queryset = Video.objects.all()
+    serializer_class = VideoProgressSerializer
+
+    permission_classes = [permissions.IsAdminUser]
+
+
+class VideoUploadCreateView(generics.CreateAPIView):
+    """
+    Starts a resumable upload, the file is then sent with PATCH requests to the returned location
+    """
+
+    serializer_class = VideoUploadSerializer
+
+    permission_classes = [permissions.IsAdminUser]
+
+    def perform_create(self, serializer):
+        serializer.save(user=self.request.user)
+
+    def create(self, request, *args, **kwargs):
+        response = super().create(request, *args, **kwargs)
+        response["Location"] = f"/api/video/uploads/{response.data['id']}/"
+        response["Upload-Offset"] = "0"
+        return response
+
+
+class VideoUploadDetailView(generics.RetrieveAPIView):
+    """
+    HEAD/GET return the current offset of an upload,
+    PATCH appends application/offset+octet-stream bytes starting at Upload-Offset
+    """
+
+    queryset = VideoUpload.objects.all()
+    serializer_class = VideoUploadSerializer
+
+    permission_classes = [permissions.IsAdminUser]
+
+    def retrieve(self, request, *args, **kwargs):
+        upload = self.get_object()
+        return Response(self.get_serializer(upload).data, headers=get_offset_headers(upload))
+
+    def patch(self, request, *args, **kwargs):
+        upload = self.get_object()
+
+        if request.content_type != "application/offset+octet-stream":
+            return Response(
+                {"error": "Content-Type must be application/offset+octet-stream"},
+                status=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            )
+
+        try:
+            offset = int(request.headers["Upload-Offset"])
+            content_length = int(request.headers.get("Content-Length") or 0)
+        except (KeyError, ValueError):
+            return Response({"error": "Upload-Offset header is required"}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            with uploads.append_lock(upload) as keep_alive:
+                upload.refresh_from_db()
+                if upload.status != "uploading":
+                    return Response({"error": f"Upload is {upload.status}"}, status=status.HTTP_409_CONFLICT)
+
+                uploads.append_chunks(upload, request.stream, content_length, offset, keep_alive)
+
+                if upload.offset == upload.length:
+                    uploads.complete_upload(upload)
+
+        except uploads.UploadLockedError as e:
+            upload.refresh_from_db()
+            return Response({"error": str(e)}, status=status.HTTP_423_LOCKED, headers=get_offset_headers(upload))
+        except uploads.UploadOffsetError as e:
+            return Response({"error": str(e)}, status=status.HTTP_409_CONFLICT, headers=get_offset_headers(upload))
+        except uploads.NotAVideoError as e:
+            uploads.reject_upload(upload)
+            return Response({"error": str(e)}, status=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE)
+
+        return Response(status=status.HTTP_204_NO_CONTENT, headers=get_offset_headers(upload))
+
+
+def get_offset_headers(upload):
+    """tus style headers describing the progress of an upload."""
+    return {"Upload-Offset": str(upload.offset), "Upload-Length": str(upload.length), "Cache-Control": "no-store"}
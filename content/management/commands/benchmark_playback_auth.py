@@ -0,0 +1,78 @@
+import json
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+from rest_framework.request import Request
+from rest_framework_simplejwt.tokens import AccessToken
+
+from core.authentication import CookieJWTAuthentication, StatelessCookieJWTAuthentication
+from content.streaming.authentication import PlaybackTokenAuthentication
+from content.streaming.tokens import create_playback_token
+
+
+BENCHMARK_MOVIE_ID = 1
+
+
+class Command(BaseCommand):
+    help = (
+        "Authenticate a segment request repeatedly with the cookie JWT, the stateless cookie JWT and "
+        "a playback token, reporting time and database queries per request as JSON."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--iterations", type=int, default=5000, help="Authentications per method.")
+        parser.add_argument("--email", help="User to authenticate as, defaults to the first active user.")
+
+    def handle(self, *args, **options):
+        user = get_benchmark_user(options["email"])
+        access_token = str(AccessToken.for_user(user))
+        playback_token = create_playback_token(user.id, BENCHMARK_MOVIE_ID)
+
+        factory = RequestFactory()
+        jwt_request = factory.get("/api/video/1/720p/000.ts/")
+        jwt_request.COOKIES["access_token"] = access_token
+        playback_request = factory.get("/api/video/1/720p/000.ts/", {"token": playback_token})
+
+        methods = (
+            ("cookie_jwt", CookieJWTAuthentication(), jwt_request),
+            ("stateless_cookie_jwt", StatelessCookieJWTAuthentication(), jwt_request),
+            ("playback_token", PlaybackTokenAuthentication(), playback_request),
+        )
+
+        results = {"iterations": options["iterations"], "methods": {}}
+        for name, authenticator, request in methods:
+            results["methods"][name] = benchmark_authenticator(authenticator, request, options["iterations"])
+
+        self.stdout.write(json.dumps(results, indent=2))
+
+
+def get_benchmark_user(email):
+    users = get_user_model().objects.filter(is_active=True).order_by("pk")
+    user = users.filter(email=email).first() if email else users.first()
+    if user is None:
+        raise CommandError("No active user to authenticate as")
+    return user
+
+
+def benchmark_authenticator(authenticator, django_request, iterations):
+    """Time authenticate() on a DRF request wrapping the segment URL and count its queries."""
+    request = Request(django_request, parser_context={"kwargs": {"movie_id": BENCHMARK_MOVIE_ID}})
+
+    if authenticator.authenticate(request) is None:
+        raise CommandError(f"{type(authenticator).__name__} did not authenticate the benchmark request")
+
+    with CaptureQueriesContext(connection) as queries:
+        start = time.perf_counter()
+        for _ in range(iterations):
+            authenticator.authenticate(request)
+        elapsed = time.perf_counter() - start
+
+    return {
+        "total_seconds": round(elapsed, 4),
+        "microseconds_per_request": round(elapsed / iterations * 1e6, 2),
+        "queries_per_request": len(queries) / iterations,
+    }
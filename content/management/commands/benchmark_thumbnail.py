@@ -0,0 +1,116 @@
+import os
+import json
+import math
+import time
+import shutil
+import resource
+import tempfile
+import multiprocessing
+
+import ffmpeg
+from django.core.management.base import BaseCommand
+
+from content.utils import video_processing
+
+
+THUMBNAIL_TIMESTAMP = 20
+
+
+class Command(BaseCommand):
+    help = (
+        "Thumbnail a large synthetic video once through an in-memory copy of the upload "
+        "and once by seeking in the stored file, reporting time and peak RSS as JSON."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--size-mb", type=int, default=1024, help="Approximate size of the synthetic video.")
+        parser.add_argument("--keep", action="store_true", help="Keep the synthetic video and print its path.")
+
+    def handle(self, *args, **options):
+        work_dir = tempfile.mkdtemp(prefix="videoflix-thumbnail-benchmark-")
+
+        try:
+            source_path = create_synthetic_video(work_dir, options["size_mb"] * 1024 * 1024)
+            results = {"source_bytes": os.path.getsize(source_path), "runs": {}}
+
+            for name, variant in (("in_memory_copy", thumbnail_in_memory_copy), ("direct_seek", thumbnail_direct_seek)):
+                results["runs"][name] = run_isolated(variant, source_path, work_dir)
+
+            if options["keep"]:
+                results["source_path"] = source_path
+
+            self.stdout.write(json.dumps(results, indent=2))
+
+        finally:
+            if not options["keep"]:
+                shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def create_synthetic_video(work_dir, target_bytes):
+    """Encode a short high bitrate lavfi clip and loop it without re-encoding up to the target size."""
+    clip_path = os.path.join(work_dir, "clip.mp4")
+    (
+        ffmpeg.output(
+            ffmpeg.input("testsrc2=size=1920x1080:rate=25:duration=30", f="lavfi"),
+            ffmpeg.input("sine=frequency=440:duration=30", f="lavfi"),
+            clip_path,
+            vcodec="mpeg4",
+            acodec="aac",
+            **{"q:v": 1},
+        )
+        .overwrite_output()
+        .run(quiet=True)
+    )
+
+    loops = max(math.ceil(target_bytes / os.path.getsize(clip_path)), 1)
+    source_path = os.path.join(work_dir, "source.mp4")
+    ffmpeg.input(clip_path, stream_loop=loops - 1).output(source_path, c="copy").overwrite_output().run(quiet=True)
+    os.unlink(clip_path)
+
+    return source_path
+
+
+def thumbnail_in_memory_copy(source_path, work_dir):
+    """The former pipeline: read the whole upload into memory and copy it to a temporary file."""
+    temp_video_path = os.path.join(work_dir, "copy.mp4")
+    with open(source_path, "rb") as source, open(temp_video_path, "wb") as temp_video:
+        temp_video.write(source.read())
+
+    try:
+        video_processing.render_thumbnail(temp_video_path, os.path.join(work_dir, "copy.jpg"), THUMBNAIL_TIMESTAMP)
+    finally:
+        os.unlink(temp_video_path)
+
+
+def thumbnail_direct_seek(source_path, work_dir):
+    """The current pipeline for local storage: ffmpeg seeks straight into the stored file."""
+    video_processing.render_thumbnail(source_path, os.path.join(work_dir, "direct.jpg"), THUMBNAIL_TIMESTAMP)
+
+
+def run_isolated(variant, source_path, work_dir):
+    """Run a variant in a fresh process so its peak RSS is not shared with other runs."""
+    context = multiprocessing.get_context("fork")
+    results = context.Queue()
+    process = context.Process(target=measure, args=(variant, source_path, work_dir, results))
+    process.start()
+    result = results.get()
+    process.join()
+    return result
+
+
+def measure(variant, source_path, work_dir, results):
+    """Measure wall time and peak RSS of the worker process (ru_maxrss is in KiB on Linux)."""
+    started = time.perf_counter()
+    try:
+        variant(source_path, work_dir)
+    except Exception as e:
+        results.put({"error": str(e)})
+        return
+    seconds = time.perf_counter() - started
+
+    results.put(
+        {
+            "seconds": round(seconds, 3),
+            "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        }
+    )
@@ -0,0 +1,217 @@
+import os
+import json
+import time
+import shutil
+import resource
+import tempfile
+import multiprocessing
+
+from datetime import timedelta
+
+import ffmpeg
+from django.core.management.base import BaseCommand
+from django.db import connection, connections
+from django.test.utils import override_settings
+
+from content.models import Video, VideoMediaInfo, VideoQuality
+from content.utils import video_processing
+
+
+LOCMEM_CACHES = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+
+
+class Command(BaseCommand):
+    help = (
+        "Encode deterministic lavfi test clips through the thumbnail and HLS pipeline and report "
+        "wall time, x-realtime speed, peak RSS and output bytes per rendition as JSON. Runs against "
+        "a throwaway test database and an in-memory cache, the database user needs to create databases."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--heights", default="480,720,1080", help="Comma separated 16:9 clip heights.")
+        parser.add_argument("--durations", default="10,60", help="Comma separated clip durations in seconds.")
+        parser.add_argument(
+            "--mode",
+            choices=["sequential", "single_pass"],
+            default="sequential",
+            help="Encode the renditions one by one or in a single ffmpeg run.",
+        )
+        parser.add_argument("--keep", action="store_true", help="Keep clips and output and print the directory.")
+
+    def handle(self, *args, **options):
+        work_dir = tempfile.mkdtemp(prefix="videoflix-transcode-benchmark-")
+        results = {"mode": options["mode"], "clips": {}}
+
+        # The benchmark rows and their signals must never reach the catalogue or the shared cache
+        database_name = connection.settings_dict["NAME"]
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        settings_override = override_settings(CACHES=LOCMEM_CACHES, MEDIA_ROOT=work_dir)
+        settings_override.enable()
+
+        try:
+            for height in parse_list(options["heights"]):
+                for duration in parse_list(options["durations"]):
+                    name = f"{height}p_{duration}s"
+                    clip_dir = os.path.join(work_dir, name)
+                    os.makedirs(clip_dir)
+
+                    source_path = create_test_clip(clip_dir, height, duration)
+                    results["clips"][name] = benchmark_clip(source_path, clip_dir, height, duration, options["mode"])
+
+            if options["keep"]:
+                results["work_dir"] = work_dir
+
+            self.stdout.write(json.dumps(results, indent=2))
+
+        finally:
+            settings_override.disable()
+            connection.creation.destroy_test_db(database_name, verbosity=0)
+            if not options["keep"]:
+                shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def parse_list(value):
+    return [int(item) for item in value.split(",") if item.strip()]
+
+
+def create_test_clip(clip_dir, height, duration):
+    """Render a deterministic testsrc2/sine clip in 16:9 at the given height and duration."""
+    width = round(height * 16 / 9 / 2) * 2
+    source_path = os.path.join(clip_dir, "source.mp4")
+    (
+        ffmpeg.output(
+            ffmpeg.input(f"testsrc2=size={width}x{height}:rate=25:duration={duration}", f="lavfi"),
+            ffmpeg.input(f"sine=frequency=440:duration={duration}", f="lavfi"),
+            source_path,
+            vcodec="mpeg4",
+            acodec="aac",
+            **{"q:v": 2},
+        )
+        .overwrite_output()
+        .run(quiet=True)
+    )
+    return source_path
+
+
+def benchmark_clip(source_path, clip_dir, height, duration, mode):
+    """
+    Run the pipeline on one clip with a Video row in the benchmark test database (without
+    video_file, so no jobs are enqueued) carrying the known media info of the clip.
+    """
+    video = Video.objects.create(title=f"benchmark {os.path.basename(clip_dir)}", description="benchmark")
+    media_info = VideoMediaInfo.objects.create(
+        video=video,
+        duration=duration,
+        width=round(height * 16 / 9 / 2) * 2,
+        height=height,
+        frame_rate=25,
+        has_audio=True,
+    )
+    video.duration = timedelta(seconds=duration)
+    video.save(update_fields=["duration"])
+
+    resolutions = video_processing.get_resolutions(media_info)
+    for resolution, config in resolutions.items():
+        video_processing.get_or_create_quality(video, resolution, config)
+
+    result = {
+        "source_bytes": os.path.getsize(source_path),
+        "thumbnail": run_isolated(benchmark_thumbnail, duration, video.id, source_path, clip_dir),
+        "renditions": {},
+    }
+
+    output_dir = os.path.join(clip_dir, "hls")
+    if mode == "single_pass":
+        label = "+".join(resolutions)
+        result["renditions"][label] = run_isolated(
+            benchmark_single_pass, duration, video.id, resolutions, output_dir, source_path
+        )
+    else:
+        trickplay_rendition = video_processing.get_trickplay_rendition(resolutions)
+        for resolution, config in resolutions.items():
+            result["renditions"][resolution] = run_isolated(
+                benchmark_rendition,
+                duration,
+                video.id,
+                resolution,
+                config,
+                output_dir,
+                source_path,
+                resolution == trickplay_rendition,
+            )
+
+    return result
+
+
+def benchmark_thumbnail(video_id, source_path, clip_dir):
+    video = Video.objects.get(id=video_id)
+    thumbnail_path = os.path.join(clip_dir, "thumbnail.jpg")
+    video_processing.render_thumbnail(source_path, thumbnail_path, video_processing.set_timestamp(video))
+    return os.path.getsize(thumbnail_path)
+
+
+def benchmark_rendition(video_id, resolution, config, output_dir, source_path, trickplay):
+    video = Video.objects.get(id=video_id)
+    quality = VideoQuality.objects.get(video=video, resolution=resolution)
+    video_processing.try_generate_video_quality(
+        video, resolution, config, output_dir, source_path, quality, "", trickplay
+    )
+    return get_output_bytes(output_dir, [resolution])
+
+
+def benchmark_single_pass(video_id, resolutions, output_dir, source_path):
+    video = Video.objects.get(id=video_id)
+    qualities = {quality.resolution: quality for quality in video.qualities.all()}
+    video_processing.try_generate_video_qualities_single_pass(
+        video, resolutions, output_dir, source_path, qualities, ""
+    )
+    return get_output_bytes(output_dir, resolutions)
+
+
+def get_output_bytes(output_dir, resolutions):
+    """Size of everything written for the renditions, trickplay sprites included."""
+    total = 0
+    for directory in [*resolutions, video_processing.TRICKPLAY_DIR]:
+        for root, _, file_names in os.walk(os.path.join(output_dir, directory)):
+            total += sum(os.path.getsize(os.path.join(root, file_name)) for file_name in file_names)
+    return total
+
+
+def run_isolated(step, duration, *args):
+    """
+    Run a step in a fresh process, so the peak RSS of its ffmpeg children is measured alone.
+    Database connections are closed first, the child opens its own.
+    """
+    connections.close_all()
+    context = multiprocessing.get_context("fork")
+    results = context.Queue()
+    process = context.Process(target=measure, args=(step, duration, args, results))
+    process.start()
+    result = results.get()
+    process.join()
+    return result
+
+
+def measure(step, duration, args, results):
+    """Measure wall time, x-realtime speed, peak RSS of the ffmpeg children (KiB on Linux) and output bytes."""
+    started = time.perf_counter()
+    try:
+        output_bytes = step(*args)
+    except ffmpeg.Error as e:
+        results.put({"error": e.stderr.decode(errors="replace")[-500:] if e.stderr else str(e)})
+        return
+    except Exception as e:
+        results.put({"error": str(e)})
+        return
+    finally:
+        connections.close_all()
+    seconds = time.perf_counter() - started
+
+    results.put(
+        {
+            "seconds": round(seconds, 3),
+            "speed": round(duration / seconds, 2),
+            "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024, 1),
+            "output_bytes": output_bytes,
+        }
+    )
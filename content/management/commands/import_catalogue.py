@@ -0,0 +1,139 @@
+import os
+import json
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from rq.job import Dependency
+
+from content.models import Video
+from content.tasks import ingest_video_task
+
+
+class Command(BaseCommand):
+    help = (
+        "Create Video rows in bulk from a catalogue manifest like film.json (title, file, genre, description) "
+        "and enqueue their ingest jobs in a bounded number of lanes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("manifest", nargs="?", default="film.json", help="Path of the JSON manifest.")
+        parser.add_argument(
+            "--source-dir",
+            default=os.path.join(settings.MEDIA_ROOT, "videos"),
+            help="Directory the relative file names of the manifest are resolved against.",
+        )
+        parser.add_argument("--batch-size", type=int, default=500, help="Rows per bulk_create batch.")
+        parser.add_argument("--concurrency", type=int, default=4, help="Ingest jobs queued at the same time.")
+        parser.add_argument("--dry-run", action="store_true", help="Only report what would be imported.")
+
+    def handle(self, *args, **options):
+        try:
+            with open(options["manifest"], "r", encoding="utf-8") as f:
+                entries = json.load(f)
+        except (OSError, ValueError) as e:
+            raise CommandError(f"Could not read {options['manifest']}: {e}")
+
+        copied = []
+        try:
+            videos, skipped = collect_videos(entries, options, copied)
+
+            for message in skipped:
+                self.stdout.write(f"Skipped {message}")
+
+            if options["dry_run"]:
+                self.stdout.write(f"{len(videos)} videos would be imported.")
+                return
+
+            with transaction.atomic():
+                videos = Video.objects.bulk_create(videos, batch_size=options["batch_size"])
+
+        except BaseException:
+            # No row references the copies of a failed import
+            for file_name in copied:
+                default_storage.delete(file_name)
+            raise
+
+        lanes = enqueue_ingest_lanes(videos, options["concurrency"])
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Imported {len(videos)} videos, ingest queued in {lanes} lanes, {len(skipped)} skipped."
+            )
+        )
+
+
+def collect_videos(entries, options, copied):
+    """
+    Build the unsaved videos of the manifest entries that were not imported before, identified by
+    their source path, or by the storage name for files already under MEDIA_ROOT. Files from
+    outside MEDIA_ROOT are copied into it, their storage names are appended to copied.
+    """
+    imported_sources = set(Video.objects.exclude(import_source="").values_list("import_source", flat=True))
+    existing_files = set(Video.objects.exclude(video_file="").values_list("video_file", flat=True))
+    videos, skipped = [], []
+
+    for entry in entries:
+        source_path = resolve_source_path(entry["file"], options["source_dir"])
+        if not os.path.isfile(source_path):
+            skipped.append(f"{entry['title']}: {source_path} not found")
+            continue
+
+        file_name = get_media_name(source_path)
+        if source_path in imported_sources or file_name in existing_files:
+            skipped.append(f"{entry['title']}: {source_path} already imported")
+            continue
+
+        if file_name is None and not options["dry_run"]:
+            file_name = store_file(source_path)
+            copied.append(file_name)
+
+        imported_sources.add(source_path)
+        videos.append(build_video(entry, file_name, source_path))
+
+    return videos, skipped
+
+
+def resolve_source_path(file, source_dir):
+    return os.path.abspath(file if os.path.isabs(file) else os.path.join(source_dir, file))
+
+
+def get_media_name(source_path):
+    """Storage name of a file already under MEDIA_ROOT, None for files that need to be copied."""
+    media_root = os.path.abspath(settings.MEDIA_ROOT)
+    if os.path.commonpath([source_path, media_root]) != media_root:
+        return None
+    return os.path.relpath(source_path, media_root)
+
+
+def store_file(source_path):
+    """Copy a file from outside MEDIA_ROOT into the upload directory of Video.video_file."""
+    with open(source_path, "rb") as f:
+        return default_storage.save(os.path.join("videos", os.path.basename(source_path)), File(f))
+
+
+def build_video(entry, file_name, source_path):
+    return Video(
+        title=entry["title"][:80],
+        description=entry.get("description", ""),
+        category=entry.get("genre", "None")[:40],
+        video_file=file_name,
+        import_source=source_path,
+    )
+
+
+def enqueue_ingest_lanes(videos, concurrency):
+    """
+    bulk_create skips the post_save signal, so the ingest jobs are queued here. Each lane runs its
+    ingest jobs one after another (a job depends on its predecessor, failed or not), so at most
+    `concurrency` ingest jobs of the import are queued at once.
+    """
+    lanes = [None] * max(min(concurrency, len(videos)), 1)
+
+    for index, video in enumerate(videos):
+        lane = index % len(lanes)
+        depends_on = Dependency(jobs=[lanes[lane]], allow_failure=True) if lanes[lane] else None
+        lanes[lane] = ingest_video_task.delay(video.id, depends_on=depends_on)
+
+    return len(lanes) if videos else 0
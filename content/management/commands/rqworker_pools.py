@@ -0,0 +1,70 @@
+import sys
+import time
+import signal
+import subprocess
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = (
+        "Start one rqworker-pool per queue in RQ_WORKER_POOLS, sized per queue, "
+        "so mail and thumbnail jobs never wait behind transcodes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("queues", nargs="*", help="Queues to serve, defaults to all of RQ_WORKER_POOLS.")
+        parser.add_argument("--burst", action="store_true", help="Stop the workers once their queues are empty.")
+
+    def handle(self, *args, **options):
+        queues = options["queues"] or list(settings.RQ_WORKER_POOLS)
+        unknown = [queue for queue in queues if queue not in settings.RQ_QUEUES]
+        if unknown:
+            raise CommandError(f"Unknown queues: {', '.join(unknown)}")
+
+        pools = {queue: settings.RQ_WORKER_POOLS.get(queue, 1) for queue in queues}
+
+        processes = {
+            queue: start_pool(queue, num_workers, options["burst"], options["verbosity"])
+            for queue, num_workers in pools.items()
+            if num_workers > 0
+        }
+        self.stdout.write(", ".join(f"{queue}: {pools[queue]} workers" for queue in processes))
+
+        def stop(signum, frame):
+            for process in processes.values():
+                process.send_signal(signal.SIGTERM)
+
+        signal.signal(signal.SIGTERM, stop)
+        signal.signal(signal.SIGINT, stop)
+
+        sys.exit(supervise(processes, options["burst"]))
+
+
+def start_pool(queue, num_workers, burst, verbosity):
+    """Run django_rq's rqworker-pool for a single queue in its own process."""
+    command = [sys.executable, sys.argv[0], "rqworker-pool", queue, "--num-workers", str(num_workers)]
+    command += ["--verbosity", str(verbosity)]
+    if burst:
+        command.append("--burst")
+    return subprocess.Popen(command)
+
+
+def supervise(processes, burst):
+    """
+    Wait for the pools. Outside burst mode a pool exiting stops all of them,
+    so the container restarts with a complete topology.
+    """
+    while True:
+        exited = {queue: process.poll() for queue, process in processes.items() if process.poll() is not None}
+
+        if len(exited) == len(processes) or (exited and not burst):
+            for process in processes.values():
+                if process.poll() is None:
+                    process.terminate()
+            for process in processes.values():
+                process.wait()
+            return max(process.returncode for process in processes.values())
+
+        time.sleep(1)
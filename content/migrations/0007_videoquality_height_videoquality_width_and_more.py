@@ -0,0 +1,28 @@
+# Generated by Django 5.2.4 on 2026-10-18 18:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("content", "0006_alter_videoquality_resolution"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="videoquality",
+            name="height",
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="videoquality",
+            name="width",
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name="videoquality",
+            name="resolution",
+            field=models.CharField(max_length=10),
+        ),
+    ]
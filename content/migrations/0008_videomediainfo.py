@@ -0,0 +1,64 @@
+# Generated by Django 5.2.4 on 2026-10-18 18:19
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("content", "0007_videoquality_height_videoquality_width_and_more"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="VideoMediaInfo",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("format_name", models.CharField(blank=True, max_length=100)),
+                ("duration", models.FloatField(blank=True, null=True)),
+                ("width", models.PositiveIntegerField(blank=True, null=True)),
+                ("height", models.PositiveIntegerField(blank=True, null=True)),
+                ("frame_rate", models.FloatField(blank=True, null=True)),
+                (
+                    "bitrate",
+                    models.PositiveIntegerField(
+                        blank=True, help_text="Video bitrate in kbit/s", null=True
+                    ),
+                ),
+                ("video_codec", models.CharField(blank=True, max_length=40)),
+                ("audio_codec", models.CharField(blank=True, max_length=40)),
+                ("has_audio", models.BooleanField(default=False)),
+                (
+                    "keyframe_interval",
+                    models.FloatField(
+                        blank=True,
+                        help_text="Median keyframe distance in seconds",
+                        null=True,
+                    ),
+                ),
+                ("streams", models.JSONField(blank=True, default=list)),
+                ("probed_at", models.DateTimeField(auto_now=True)),
+                (
+                    "video",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="media_info",
+                        to="content.video",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Media info",
+                "verbose_name_plural": "Media info",
+            },
+        ),
+    ]
@@ -0,0 +1,91 @@
+# Generated by Django 5.2.4 on 2026-10-18 18:25
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("content", "0008_videomediainfo"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="VideoUpload",
+            fields=[
+                (
+                    "id",
+                    models.UUIDField(
+                        default=uuid.uuid4,
+                        editable=False,
+                        primary_key=True,
+                        serialize=False,
+                    ),
+                ),
+                ("title", models.CharField(max_length=80)),
+                ("description", models.TextField(max_length=400)),
+                ("category", models.CharField(default="None", max_length=40)),
+                ("filename", models.CharField(max_length=255)),
+                (
+                    "file_name",
+                    models.CharField(
+                        help_text="Storage name of the file relative to MEDIA_ROOT",
+                        max_length=255,
+                    ),
+                ),
+                (
+                    "length",
+                    models.PositiveBigIntegerField(
+                        help_text="Total size of the upload in bytes"
+                    ),
+                ),
+                (
+                    "offset",
+                    models.PositiveBigIntegerField(
+                        default=0, help_text="Bytes received so far"
+                    ),
+                ),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("uploading", "Uploading"),
+                            ("completed", "Completed"),
+                            ("failed", "Failed"),
+                        ],
+                        default="uploading",
+                        max_length=20,
+                    ),
+                ),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="video_uploads",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+                (
+                    "video",
+                    models.OneToOneField(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="upload",
+                        to="content.video",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Video upload",
+                "verbose_name_plural": "Video uploads",
+                "ordering": ["-created_at"],
+            },
+        ),
+    ]
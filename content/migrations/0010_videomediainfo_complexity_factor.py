@@ -0,0 +1,22 @@
+# Generated by Django 5.2.4 on 2026-10-18 18:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("content", "0009_videoupload"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="videomediainfo",
+            name="complexity_factor",
+            field=models.FloatField(
+                blank=True,
+                help_text="Bitrate of constant quality samples relative to the default ladder",
+                null=True,
+            ),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.4 on 2026-10-18 18:33
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("content", "0010_videomediainfo_complexity_factor"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="video",
+            name="content_hash",
+            field=models.CharField(
+                blank=True,
+                db_index=True,
+                help_text="SHA-256 of the video file",
+                max_length=64,
+            ),
+        ),
+        migrations.AddField(
+            model_name="video",
+            name="hls_source",
+            field=models.ForeignKey(
+                blank=True,
+                help_text="Video with identical content whose HLS output is reused",
+                null=True,
+                on_delete=django.db.models.deletion.DO_NOTHING,
+                related_name="hls_copies",
+                to="content.video",
+            ),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.4 on 2026-10-18 18:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("content", "0011_video_content_hash_video_hls_source"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="videomediainfo",
+            name="rotation",
+            field=models.PositiveSmallIntegerField(
+                default=0, help_text="Display rotation of the source in degrees"
+            ),
+        ),
+        migrations.AlterField(
+            model_name="videomediainfo",
+            name="height",
+            field=models.PositiveIntegerField(
+                blank=True, help_text="Displayed height after rotation", null=True
+            ),
+        ),
+        migrations.AlterField(
+            model_name="videomediainfo",
+            name="width",
+            field=models.PositiveIntegerField(
+                blank=True,
+                help_text="Displayed width after SAR and rotation",
+                null=True,
+            ),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.4 on 2026-10-18 19:02
+
+import os
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_has_trickplay(apps, schema_editor):
+    Video = apps.get_model("content", "Video")
+    for video in Video.objects.only("id", "hls_source_id"):
+        hls_id = video.hls_source_id or video.id
+        if os.path.exists(os.path.join(settings.MEDIA_ROOT, "hls", str(hls_id), "trickplay", "thumbnails.vtt")):
+            Video.objects.filter(id=video.id).update(has_trickplay=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("content", "0012_videomediainfo_rotation"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="video",
+            name="has_trickplay",
+            field=models.BooleanField(
+                default=False,
+                help_text="Trickplay sprites and WebVTT index are written",
+            ),
+        ),
+        migrations.RunPython(backfill_has_trickplay, migrations.RunPython.noop),
+    ]
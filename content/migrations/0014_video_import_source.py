@@ -0,0 +1,23 @@
+# Generated by Django 5.2.4 on 2026-10-18 19:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("content", "0013_video_has_trickplay"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="video",
+            name="import_source",
+            field=models.CharField(
+                blank=True,
+                db_index=True,
+                help_text="Source path of the catalogue import that created the video",
+                max_length=500,
+            ),
+        ),
+    ]
@@ -1,4 +1,7 @@
+import uuid
+
 from django.db import models
+from django.conf import settings
 from datetime import date
 
 
@@ -12,6 +15,22 @@ class Video(models.Model):
     thumbnail_url = models.URLField(blank=True, null=True)
     category = models.CharField(max_length=40, default="None")
     duration = models.DurationField(null=True, blank=True)
+    content_hash = models.CharField(max_length=64, blank=True, db_index=True, help_text="SHA-256 of the video file")
+    import_source = models.CharField(
+        max_length=500,
+        blank=True,
+        db_index=True,
+        help_text="Source path of the catalogue import that created the video",
+    )
+    # References are moved to another video by the pre_delete signal before the source is deleted
+    hls_source = models.ForeignKey(
+        "self",
+        on_delete=models.DO_NOTHING,
+        null=True,
+        blank=True,
+        related_name="hls_copies",
+        help_text="Video with identical content whose HLS output is reused",
+    )
     processing_status = models.CharField(
         max_length=20,
         choices=[
@@ -24,6 +43,7 @@ class Video(models.Model):
     )
 
     hls_master_playlist = models.FileField(upload_to="hls/master/", blank=True, null=True)
+    has_trickplay = models.BooleanField(default=False, help_text="Trickplay sprites and WebVTT index are written")
 
     class Meta:
         verbose_name = "Video"
@@ -36,15 +56,10 @@ class Video(models.Model):
 
 class VideoQuality(models.Model):
     video = models.ForeignKey(Video, on_delete=models.CASCADE, related_name="qualities")
-    resolution = models.CharField(
-        max_length=10,
-        choices=[
-            ("480p", "480p"),
-            ("720p", "720p"),
-            ("1080p", "1080p"),
-        ],
-    )
+    resolution = models.CharField(max_length=10)
     bitrate = models.IntegerField()
+    width = models.PositiveIntegerField(null=True, blank=True)
+    height = models.PositiveIntegerField(null=True, blank=True)
     hls_playlist_path = models.CharField(max_length=255, blank=True, null=True)
     processing_status = models.CharField(
         max_length=20,
@@ -62,3 +77,66 @@ class VideoQuality(models.Model):
 
     def __str__(self):
         return f"{self.video.title} - {self.resolution}"
+
+
+class VideoMediaInfo(models.Model):
+    """Media information of a video file, filled by a single ffprobe run."""
+
+    video = models.OneToOneField(Video, on_delete=models.CASCADE, related_name="media_info")
+    format_name = models.CharField(max_length=100, blank=True)
+    duration = models.FloatField(null=True, blank=True)
+    width = models.PositiveIntegerField(null=True, blank=True, help_text="Displayed width after SAR and rotation")
+    height = models.PositiveIntegerField(null=True, blank=True, help_text="Displayed height after rotation")
+    rotation = models.PositiveSmallIntegerField(default=0, help_text="Display rotation of the source in degrees")
+    frame_rate = models.FloatField(null=True, blank=True)
+    bitrate = models.PositiveIntegerField(null=True, blank=True, help_text="Video bitrate in kbit/s")
+    video_codec = models.CharField(max_length=40, blank=True)
+    audio_codec = models.CharField(max_length=40, blank=True)
+    has_audio = models.BooleanField(default=False)
+    keyframe_interval = models.FloatField(null=True, blank=True, help_text="Median keyframe distance in seconds")
+    complexity_factor = models.FloatField(
+        null=True, blank=True, help_text="Bitrate of constant quality samples relative to the default ladder"
+    )
+    streams = models.JSONField(default=list, blank=True)
+    probed_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Media info"
+        verbose_name_plural = "Media info"
+
+    def __str__(self):
+        return f"{self.video.title} - {self.width}x{self.height}"
+
+
+class VideoUpload(models.Model):
+    """Resumable chunked upload, appended in place until it becomes a Video."""
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="video_uploads")
+    title = models.CharField(max_length=80)
+    description = models.TextField(max_length=400)
+    category = models.CharField(max_length=40, default="None")
+    filename = models.CharField(max_length=255)
+    file_name = models.CharField(max_length=255, help_text="Storage name of the file relative to MEDIA_ROOT")
+    length = models.PositiveBigIntegerField(help_text="Total size of the upload in bytes")
+    offset = models.PositiveBigIntegerField(default=0, help_text="Bytes received so far")
+    status = models.CharField(
+        max_length=20,
+        choices=[
+            ("uploading", "Uploading"),
+            ("completed", "Completed"),
+            ("failed", "Failed"),
+        ],
+        default="uploading",
+    )
+    video = models.OneToOneField(Video, on_delete=models.SET_NULL, null=True, blank=True, related_name="upload")
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Video upload"
+        verbose_name_plural = "Video uploads"
+        ordering = ["-created_at"]
+
+    def __str__(self):
+        return f"{self.filename} - {self.offset}/{self.length}"
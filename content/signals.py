@@ -1,19 +1,19 @@
 import os
 from django.dispatch import receiver
-from django.db.models.signals import post_save, post_delete
+from django.db.models.signals import post_save, post_delete, pre_delete
 from django.core.files.storage import default_storage
 from django.db import transaction
 from django.conf import settings
 
-from content.models import Video
-from content.tasks import generate_video_thumbnail, process_video_task
+from content.models import Video, VideoQuality
+from content.tasks import ingest_video_task
+from content.utils import deduplication
+from content.streaming import availability, playlists
 from urllib.parse import unquote
-from datetime import timedelta
 from core.utils.tasks import enqueue_after_commit
 
 import shutil
 import logging
-import ffmpeg
 
 
 logger = logging.getLogger(__name__)
@@ -25,24 +25,57 @@ def video_post_save(sender, instance, created, **kwargs):
     Signal is triggered after a video has been saved
     """
     if created and instance.video_file:
-        try:
-            probe = ffmpeg.probe(instance.video_file.path)
-            duration_seconds = float(probe["format"]["duration"])
-            instance.duration = timedelta(seconds=duration_seconds)
-            instance.save(update_fields=["duration"])
-        except Exception as e:
-            logger.error(f"Error when extracting the duration: {e}")
-
-        logger.info(f"New Video {instance.title} uploaded, start thumbnail generation")
-        enqueue_after_commit(generate_video_thumbnail, instance.id)
-
-        logger.info(f"New Video {instance.title} uploaded, start Generating different resolutions")
-        enqueue_after_commit(process_video_task, instance.id)
+        logger.info(f"New Video {instance.title} uploaded, start ingest")
+        enqueue_after_commit(ingest_video_task, instance.id)
 
     elif not created and instance.video_file:
         pass
 
 
+@receiver(post_save, sender=VideoQuality)
+@receiver(post_delete, sender=VideoQuality)
+def video_quality_changed(sender, instance, **kwargs):
+    """
+    Drop the cached playlists of a rendition when it is re-encoded or removed,
+    including those of videos reusing its HLS output.
+    """
+    video_ids = [instance.video_id, *Video.objects.filter(hls_source_id=instance.video_id).values_list("id", flat=True)]
+    playlists.invalidate_playlists(video_ids, instance.resolution)
+
+
+@receiver(post_save, sender=VideoQuality)
+def video_quality_post_save(sender, instance, **kwargs):
+    """
+    Keep the rendition availability index used by hls_segment in sync.
+    """
+    availability.update_rendition_availability(instance)
+
+
+@receiver(post_delete, sender=VideoQuality)
+def video_quality_post_delete(sender, instance, **kwargs):
+    """
+    Remove a deleted rendition from the availability index and its HLS-files from the filesystem.
+    """
+    availability.remove_rendition_availability(instance)
+    cleanup_rendition_files(instance)
+
+
+@receiver(pre_delete, sender=Video)
+def video_pre_delete(sender, instance, origin=None, **kwargs):
+    """
+    Hand shared HLS output to a video that reuses it
+    before the 'Video' object is deleted.
+    """
+    # In a bulk delete an earlier video of the batch may have changed this one since it was loaded,
+    # the refreshed value is also what cleanup_hls_files sees after the row is gone
+    instance.hls_source_id = deduplication.get_hls_source_id(instance.id)
+    try:
+        deduplication.rehome_hls_output(instance, deduplication.get_deleted_video_ids(instance, origin))
+    except Exception as e:
+        Video.objects.filter(hls_source=instance).update(hls_source=None)
+        logger.error(f"Error when moving the HLS-files of {instance.id}: {str(e)}")
+
+
 @receiver(post_delete, sender=Video)
 def video_post_delete(sender, instance, **kwargs):
     """
@@ -71,7 +104,10 @@ def video_post_delete(sender, instance, **kwargs):
 
 
 def cleanup_hls_files(video):
-    """Helpfunction delte HLS-files"""
+    """Helpfunction delte HLS-files, unless another video still references them"""
+
+    if deduplication.is_hls_output_referenced(video):
+        return
 
     video_dir = os.path.join(settings.MEDIA_ROOT, "hls", str(video.id))
     if os.path.exists(video_dir):
@@ -80,3 +116,18 @@ def cleanup_hls_files(video):
             print(f"HLS-files Video {video.title} deletet")
         except Exception as e:
             print(f"Error delete HLS-files: {e}")
+
+
+def cleanup_rendition_files(quality):
+    """Helpfunction delete the HLS-files of a rendition, unless another video still references them"""
+
+    if deduplication.is_rendition_output_referenced(quality):
+        return
+
+    rendition_dir = os.path.join(settings.MEDIA_ROOT, "hls", str(quality.video_id), quality.resolution)
+    if os.path.exists(rendition_dir):
+        try:
+            shutil.rmtree(rendition_dir)
+            logger.info(f"HLS-files of {quality.resolution} for Video {quality.video_id} deleted")
+        except Exception as e:
+            logger.error(f"Error when deleting the HLS-files of {quality.resolution} for {quality.video_id}: {str(e)}")
@@ -0,0 +1,87 @@
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.http import Http404, JsonResponse
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import require_GET
+from rest_framework.exceptions import APIException, NotAuthenticated
+from rest_framework.request import Request
+
+from core.authentication import CookieJWTAuthentication, StatelessCookieJWTAuthentication
+from content.streaming.authentication import PlaybackTokenAuthentication
+from content.streaming import availability
+from content.streaming.views import (
+    build_segment_path,
+    get_valid_segment_content_type,
+    load_playlist,
+    playlist_response,
+    segment_response,
+)
+
+
+@require_GET
+@cache_control(max_age=300)
+async def hls_playlist(request, movie_id, resolution):
+    """
+    Async variant of views.hls_playlist served under ASGI (SERVER_PROFILE=asgi).
+    Authentication and the database and cache lookups run in the thread-sensitive executor,
+    where Django keeps the database connections of the request.
+    """
+    try:
+        authenticator, (user, auth) = await sync_to_async(authenticate)(
+            request, movie_id, [PlaybackTokenAuthentication(), CookieJWTAuthentication()]
+        )
+        playlist, error = await sync_to_async(load_playlist)(movie_id, resolution)
+    except (APIException, Http404) as e:
+        return error_response(e)
+
+    if error:
+        return JsonResponse(*error)
+
+    playback_token = auth if isinstance(authenticator, PlaybackTokenAuthentication) else None
+    return playlist_response(request, playlist, playback_token)
+
+
+@require_GET
+async def hls_segment(request, movie_id, resolution, segment_name):
+    """
+    Async variant of views.hls_segment served under ASGI (SERVER_PROFILE=asgi).
+    Tokens are verified on the event loop, the availability index is read from the cache in
+    the thread pool and only a cache miss goes to the database in the thread-sensitive executor.
+    The segment is streamed from the thread pool in CHUNK_SIZE pieces, so a slow or
+    disconnecting client never holds a worker.
+    """
+    try:
+        authenticate(request, movie_id, [PlaybackTokenAuthentication(), StatelessCookieJWTAuthentication()])
+        content_type = get_valid_segment_content_type(segment_name)
+        hls_dir_id = await sync_to_async(availability.get_cached_hls_dir_id, thread_sensitive=False)(
+            movie_id, resolution
+        )
+        if hls_dir_id is None:
+            hls_dir_id = await sync_to_async(availability.get_available_hls_dir_id)(movie_id, resolution)
+
+        segment_path = build_segment_path(hls_dir_id, resolution, segment_name)
+        return await asyncio.to_thread(segment_response, request, segment_path, content_type, True)
+    except (APIException, Http404) as e:
+        return error_response(e)
+
+
+def authenticate(request, movie_id, authenticators):
+    """
+    Run DRF authenticators on a plain Django request the way an APIView does and return
+    the successful one with its (user, auth). Raises NotAuthenticated without credentials.
+    """
+    drf_request = Request(request, parser_context={"kwargs": {"movie_id": movie_id}})
+    for authenticator in authenticators:
+        user_auth = authenticator.authenticate(drf_request)
+        if user_auth is not None:
+            return authenticator, user_auth
+
+    raise NotAuthenticated()
+
+
+def error_response(exception):
+    """JSON error body like DRF, authentication errors are 403 as the authenticators send no challenge."""
+    if isinstance(exception, Http404):
+        return JsonResponse({"detail": str(exception)}, status=404)
+    return JsonResponse({"detail": exception.detail}, status=403)
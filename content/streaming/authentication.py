@@ -0,0 +1,28 @@
+from django.core import signing
+from rest_framework import authentication
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.settings import api_settings
+
+from content.streaming.tokens import verify_playback_token
+
+
+class PlaybackTokenAuthentication(authentication.BaseAuthentication):
+    """
+    Authenticates HLS requests carrying a playback token in the "token" query parameter.
+    The token is checked against the movie_id of the URL with the secret key only, the user
+    is a TokenUser, so no database query is made.
+    """
+
+    def authenticate(self, request):
+        token = request.query_params.get("token")
+        if token is None:
+            return None
+
+        movie_id = request.parser_context["kwargs"].get("movie_id")
+
+        try:
+            user_id = verify_playback_token(token, movie_id)
+        except signing.BadSignature:
+            raise AuthenticationFailed("Invalid or expired playback token", code="invalid_playback_token")
+
+        return api_settings.TOKEN_USER_CLASS({api_settings.USER_ID_CLAIM: user_id}), token
@@ -0,0 +1,68 @@
+import logging
+
+from django.core.cache import cache
+
+from content.models import VideoQuality
+
+
+logger = logging.getLogger(__name__)
+
+# Cached for renditions that exist but are not completed, a missing rendition is not cached
+RENDITION_UNAVAILABLE = 0
+
+# Entries are kept current by the VideoQuality signals, the timeout heals any that went stale
+RENDITION_CACHE_TIMEOUT = 60 * 10
+
+
+def get_rendition_key(video_id, resolution):
+    return f"hls-rendition:{video_id}:{resolution}"
+
+
+def get_cached_hls_dir_id(video_id, resolution):
+    """Cached HLS directory id of a rendition, RENDITION_UNAVAILABLE or None on a cache miss."""
+    try:
+        return cache.get(get_rendition_key(video_id, resolution))
+    except Exception as e:
+        logger.warning(f"Rendition availability cache unavailable: {e}")
+        return None
+
+
+def get_available_hls_dir_id(video_id, resolution):
+    """
+    Id of the HLS directory holding a completed rendition, None if the rendition does not
+    exist or is not completed. Served from the cache, the database is only asked on a miss.
+    """
+    hls_dir_id = get_cached_hls_dir_id(video_id, resolution)
+    if hls_dir_id is None:
+        quality = VideoQuality.objects.select_related("video").filter(video_id=video_id, resolution=resolution).first()
+        if quality is None:
+            return None
+        # add, not set: a worker's post_save may have stored a newer state since the quality was read
+        hls_dir_id = store_rendition_availability(quality, cache.add)
+
+    return hls_dir_id or None
+
+
+def update_rendition_availability(quality):
+    """Store where a rendition can be served from, or that it is unavailable."""
+    return store_rendition_availability(quality, cache.set)
+
+
+def store_rendition_availability(quality, cache_method):
+    hls_dir_id = RENDITION_UNAVAILABLE
+    if quality.processing_status == "completed":
+        hls_dir_id = quality.video.hls_source_id or quality.video_id
+
+    try:
+        cache_method(get_rendition_key(quality.video_id, quality.resolution), hls_dir_id, RENDITION_CACHE_TIMEOUT)
+    except Exception as e:
+        logger.warning(f"Could not update the availability of {quality}: {e}")
+
+    return hls_dir_id
+
+
+def remove_rendition_availability(quality):
+    try:
+        cache.delete(get_rendition_key(quality.video_id, quality.resolution))
+    except Exception as e:
+        logger.warning(f"Could not remove the availability of {quality}: {e}")
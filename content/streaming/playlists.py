@@ -0,0 +1,112 @@
+import os
+import hashlib
+import logging
+
+from urllib.parse import quote
+
+from django.core.cache import cache
+
+from content.streaming.responses import get_segment_content_type
+from content.utils.video_processing import get_hls_dir
+
+
+logger = logging.getLogger(__name__)
+
+# Rewritten playlists stay cached until their rendition changes, this only bounds stale keys
+PLAYLIST_CACHE_TIMEOUT = 60 * 60 * 24 * 7
+
+# Query parameter carrying the encode version of a segment URL, re-encodes reuse the segment names
+SEGMENT_VERSION_PARAM = "v"
+
+
+def get_playlist_cache_key(video_id, resolution):
+    return f"hls-playlist:{video_id}:{resolution}"
+
+
+def get_rewritten_playlist(video, resolution):
+    """
+    Return the API-ready media playlist of a rendition with its strong ETag and modification time,
+    from the cache when possible. Only a cache miss reads and rewrites the index.m3u8; None if it does not exist.
+    """
+    cache_key = get_playlist_cache_key(video.id, resolution)
+    playlist = cache_call(cache.get, cache_key)
+    if playlist is not None:
+        return playlist
+
+    playlist_path = os.path.join(get_hls_dir(video), resolution, "index.m3u8")
+    if not os.path.exists(playlist_path):
+        return None
+
+    with open(playlist_path, "r", encoding="utf-8") as f:
+        lines = f.read().split("\n")
+
+    # Every encode rewrites the index.m3u8, so its mtime versions the segment URLs
+    mtime_ns = os.stat(playlist_path).st_mtime_ns
+    version = f"{mtime_ns:x}"
+    content = "\n".join(rewrite_playlist_line(line, video.id, resolution, version) for line in lines).encode()
+    playlist = {
+        "content": content,
+        "etag": f'"{hashlib.sha256(content).hexdigest()[:32]}"',
+        "mtime": mtime_ns // 10**9,
+    }
+
+    cache_call(cache.set, cache_key, playlist, PLAYLIST_CACHE_TIMEOUT)
+    return playlist
+
+
+def with_playback_token(playlist, token):
+    """
+    Append a playback token to the segment and EXT-X-MAP URIs of a cached playlist. Done per
+    request so the cache holds one token-free copy, the ETag is derived from the token as well.
+    """
+    query = f"token={quote(token, safe=':')}".encode()
+    content = b"\n".join(append_query(line, query) for line in playlist["content"].split(b"\n"))
+    token_hash = hashlib.sha256(token.encode()).hexdigest()[:8]
+    return {**playlist, "content": content, "etag": f'{playlist["etag"][:-1]}-{token_hash}"'}
+
+
+def append_query(line, query):
+    if line.startswith(b"#EXT-X-MAP:"):
+        attributes, _, uri = line.partition(b'URI="')
+        uri, _, rest = uri.partition(b'"')
+        return attributes + b'URI="' + with_query(uri, query) + b'"' + rest
+
+    if line.startswith(b"/api/video/"):
+        return with_query(line.rstrip(), query)
+
+    return line
+
+
+def with_query(uri, query):
+    return uri + (b"&" if b"?" in uri else b"?") + query
+
+
+def invalidate_playlists(video_ids, resolution):
+    """Drop the cached playlists of a rendition for the given videos."""
+    cache_call(cache.delete_many, [get_playlist_cache_key(video_id, resolution) for video_id in video_ids])
+
+
+def cache_call(method, *args):
+    """Run a cache operation, treating an unreachable cache like a miss."""
+    try:
+        return method(*args)
+    except Exception as e:
+        logger.warning(f"Playlist cache unavailable: {e}")
+        return None
+
+
+def rewrite_playlist_line(line, movie_id, resolution, version):
+    """
+    Point segment URIs and the fMP4 init section (EXT-X-MAP) of a media playlist at the API,
+    versioned with the encode so the segments can be cached as immutable.
+    """
+    query = f"?{SEGMENT_VERSION_PARAM}={version}"
+    if line.startswith("#EXT-X-MAP:"):
+        attributes, _, segment_name = line.partition('URI="')
+        segment_name, _, rest = segment_name.partition('"')
+        return f'{attributes}URI="/api/video/{movie_id}/{resolution}/{segment_name}{query}"{rest}'
+
+    if not line.startswith("#") and get_segment_content_type(line.strip()):
+        return f"/api/video/{movie_id}/{resolution}/{line.strip()}{query}"
+
+    return line
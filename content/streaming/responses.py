@@ -0,0 +1,250 @@
+import os
+import re
+import asyncio
+import secrets
+import threading
+
+from urllib.parse import quote
+
+from django.conf import settings
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from django.utils.http import http_date, parse_etags, parse_http_date_safe
+
+
+CHUNK_SIZE = 64 * 1024
+
+SEGMENT_CONTENT_TYPES = {
+    ".ts": "video/mp2t",
+    ".mp4": "video/mp4",
+    ".m4s": "video/iso.segment",
+}
+
+TRICKPLAY_CONTENT_TYPES = {
+    ".vtt": "text/vtt",
+    ".jpg": "image/jpeg",
+}
+
+RANGE_RE = re.compile(r"^(\d*)-(\d*)$")
+
+# More ranges than this in one request are answered with the whole file
+MAX_RANGES = 16
+
+
+def get_segment_content_type(segment_name):
+    """Return the content type of a segment, None for unsupported names."""
+    return SEGMENT_CONTENT_TYPES.get(os.path.splitext(segment_name)[1])
+
+
+def parse_range_header(range_header, size):
+    """
+    Parse a 'bytes=start-end[, ...]' header into a list of inclusive offsets.
+    Returns None without a usable header and False if no range is satisfiable.
+    """
+    if not range_header or not range_header.strip().startswith("bytes="):
+        return None
+
+    specs = [spec.strip() for spec in range_header.strip().split("=", 1)[1].split(",")]
+    if len(specs) > MAX_RANGES:
+        return None
+
+    ranges = []
+    for spec in specs:
+        match = RANGE_RE.match(spec)
+        if not match or match.groups() == ("", ""):
+            return None
+
+        byte_range = get_byte_range(*match.groups(), size)
+        if byte_range:
+            ranges.append(byte_range)
+
+    return ranges or False
+
+
+def get_byte_range(start, end, size):
+    """Resolve one range spec against the file size, None if it is not satisfiable."""
+    if start:
+        start = int(start)
+        end = min(int(end), size - 1) if end else size - 1
+    else:
+        start = max(size - int(end), 0)
+        end = size - 1
+
+    if start > end or start >= size:
+        return None
+
+    return start, end
+
+
+def get_file_validators(path):
+    """Strong ETag (size and mtime of the immutable file) and Last-Modified date."""
+    stat = os.stat(path)
+    return f'"{stat.st_size:x}-{stat.st_mtime_ns:x}"', http_date(stat.st_mtime), stat
+
+
+def strip_weak_indicator(etag):
+    return etag.removeprefix("W/")
+
+
+def is_not_modified(request, etag, mtime):
+    """
+    Evaluate If-None-Match, or If-Modified-Since without it, like a GET precondition.
+    If-None-Match uses the weak comparison of RFC 9110, so W/ prefixes are ignored on both sides.
+    """
+    if_none_match = request.headers.get("If-None-Match")
+    if if_none_match:
+        etags = {strip_weak_indicator(tag) for tag in parse_etags(if_none_match)}
+        return "*" in etags or strip_weak_indicator(etag) in etags
+
+    if_modified_since = parse_http_date_safe(request.headers.get("If-Modified-Since") or "")
+    return None not in (if_modified_since, mtime) and int(mtime) <= if_modified_since
+
+
+def is_range_applicable(request, etag, last_modified):
+    """If-Range only allows the partial response while the validator still matches."""
+    if_range = request.headers.get("If-Range")
+    return not if_range or if_range.strip() in (etag, last_modified)
+
+
+def read_file_range(file, start, length, close=True):
+    """Yield length bytes of the file from start in bounded chunks."""
+    try:
+        file.seek(start)
+        while length > 0:
+            chunk = file.read(min(CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+    finally:
+        if close:
+            file.close()
+
+
+def read_file_ranges(file, ranges, size, content_type, boundary):
+    """Yield a multipart/byteranges body with one part per range."""
+    try:
+        for start, end in ranges:
+            yield get_multipart_header(boundary, content_type, start, end, size)
+            yield from read_file_range(file, start, end - start + 1, close=False)
+            yield b"\r\n"
+        yield f"--{boundary}--\r\n".encode()
+    finally:
+        file.close()
+
+
+def get_multipart_header(boundary, content_type, start, end, size):
+    return (
+        f"--{boundary}\r\nContent-Type: {content_type}\r\nContent-Range: bytes {start}-{end}/{size}\r\n\r\n"
+    ).encode()
+
+
+def ranged_file_response(request, path, content_type, asynchronous=False):
+    """
+    Serve a file with validators, answering conditional requests with 304 and byte ranges
+    with 206 Partial Content: a single range as is, several as multipart/byteranges.
+    For async views the body is an async iterator reading the file in the thread pool.
+    """
+    etag, last_modified, stat = get_file_validators(path)
+    size = stat.st_size
+
+    if is_not_modified(request, etag, stat.st_mtime):
+        response = HttpResponse(status=304)
+        response["ETag"] = etag
+        response["Last-Modified"] = last_modified
+        return response
+
+    ranges = None
+    if is_range_applicable(request, etag, last_modified):
+        ranges = parse_range_header(request.META.get("HTTP_RANGE"), size)
+
+    if ranges is False:
+        response = HttpResponse(status=416)
+        response["Content-Range"] = f"bytes */{size}"
+        return response
+
+    file = open(path, "rb")
+
+    if not ranges and not asynchronous:
+        response = FileResponse(file, content_type=content_type)
+    else:
+        body, headers = get_file_body(file, ranges, size, content_type)
+        response = StreamingHttpResponse(
+            stream_in_thread_pool(body) if asynchronous else body,
+            status=206 if ranges else 200,
+            headers=headers,
+        )
+
+    response["Accept-Ranges"] = "bytes"
+    response["ETag"] = etag
+    response["Last-Modified"] = last_modified
+    return response
+
+
+def get_file_body(file, ranges, size, content_type):
+    """Body iterator and headers for the whole file, a single range or a multipart/byteranges body."""
+    if not ranges:
+        return read_file_range(file, 0, size), {"Content-Type": content_type, "Content-Length": str(size)}
+
+    if len(ranges) == 1:
+        start, end = ranges[0]
+        headers = {
+            "Content-Type": content_type,
+            "Content-Range": f"bytes {start}-{end}/{size}",
+            "Content-Length": str(end - start + 1),
+        }
+        return read_file_range(file, start, end - start + 1), headers
+
+    boundary = secrets.token_hex(16)
+    content_length = (
+        sum(
+            len(get_multipart_header(boundary, content_type, start, end, size)) + end - start + 3
+            for start, end in ranges
+        )
+        + len(boundary)
+        + 6
+    )
+    headers = {"Content-Type": f"multipart/byteranges; boundary={boundary}", "Content-Length": str(content_length)}
+    return read_file_ranges(file, ranges, size, content_type, boundary), headers
+
+
+async def stream_in_thread_pool(iterator):
+    """
+    Advance a blocking file iterator in the thread pool so the event loop never waits on disk.
+    The next chunk is only read once the previous one was sent, the ASGI server's flow control
+    thereby limits memory per client. When the client disconnects the iterator is closed in the
+    pool after its pending read, which closes the file.
+    """
+    loop = asyncio.get_running_loop()
+    lock = threading.Lock()
+    try:
+        while True:
+            chunk = await loop.run_in_executor(None, call_locked, lock, next, iterator, None)
+            if chunk is None:
+                break
+            yield chunk
+    finally:
+        loop.run_in_executor(None, call_locked, lock, iterator.close)
+
+
+def call_locked(lock, function, *args):
+    with lock:
+        return function(*args)
+
+
+def delivery_response(request, path, content_type, asynchronous=False):
+    """
+    Hand a file under MEDIA_ROOT/hls to the front proxy according to HLS_DELIVERY_MODE,
+    or serve it from Django with byte range support.
+    """
+    if settings.HLS_DELIVERY_MODE == "x-accel-redirect":
+        response = HttpResponse(content_type=content_type)
+        relative_path = os.path.relpath(path, os.path.join(settings.MEDIA_ROOT, "hls"))
+        response["X-Accel-Redirect"] = f"{settings.HLS_ACCEL_REDIRECT_PREFIX.rstrip('/')}/{quote(relative_path)}"
+        return response
+
+    if settings.HLS_DELIVERY_MODE == "x-sendfile":
+        response = HttpResponse(content_type=content_type)
+        response["X-Sendfile"] = path
+        return response
+
+    return ranged_file_response(request, path, content_type, asynchronous)
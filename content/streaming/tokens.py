@@ -0,0 +1,28 @@
+from django.conf import settings
+from django.core import signing
+
+
+PLAYBACK_TOKEN_SALT = "content.streaming.playback"
+
+
+def get_playback_signer():
+    return signing.TimestampSigner(salt=PLAYBACK_TOKEN_SALT)
+
+
+def create_playback_token(user_id, movie_id):
+    """Sign a playback token that grants the user access to the HLS files of one video."""
+    return get_playback_signer().sign(f"{movie_id}:{user_id}")
+
+
+def verify_playback_token(token, movie_id):
+    """
+    Return the user id of a playback token issued for the video, using only the secret key.
+    Raises signing.BadSignature (or its subclass SignatureExpired) for invalid tokens.
+    """
+    value = get_playback_signer().unsign(token, max_age=settings.PLAYBACK_TOKEN_LIFETIME)
+    token_movie_id, _, user_id = value.partition(":")
+
+    if token_movie_id != str(movie_id):
+        raise signing.BadSignature("Playback token issued for another video")
+
+    return user_id
@@ -1,9 +1,16 @@
+from django.conf import settings
 from django.urls import path
-from .views import hls_playlist, hls_segment
+from .views import hls_playlist, hls_segment, start_playback, trickplay_file
+
+# Under ASGI playlists and segments are served by the async views, the others stay sync
+if settings.SERVER_PROFILE == "asgi":
+    from .async_views import hls_playlist, hls_segment  # noqa: F811
 
 app_name = "content-hls"
 
 urlpatterns = [
+    path("<int:movie_id>/playback/", start_playback, name="start_playback"),
+    path("<int:movie_id>/trickplay/<str:file_name>", trickplay_file, name="trickplay_file"),
     path("<int:movie_id>/<str:resolution>/index.m3u8", hls_playlist, name="hls_playlist"),
     path("<int:movie_id>/<str:resolution>/<str:segment_name>/", hls_segment, name="hls_segment"),
 ]
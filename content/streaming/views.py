@@ -1,104 +1,223 @@
 import os
 
-from django.http import HttpResponse, Http404, FileResponse
+from urllib.parse import urlencode
+
+from django.http import HttpResponse, Http404
 from django.conf import settings
 from django.shortcuts import get_object_or_404
+from django.utils.http import http_date
+from django.utils.cache import patch_cache_control
 from django.views.decorators.cache import cache_control
 
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
-from rest_framework.decorators import permission_classes
+from rest_framework.decorators import authentication_classes, permission_classes
 
 from content.models import Video, VideoQuality
+from core.authentication import CookieJWTAuthentication, StatelessCookieJWTAuthentication
+from content.streaming import availability, playlists
+from content.streaming.authentication import PlaybackTokenAuthentication
+from content.streaming.tokens import create_playback_token
+from content.streaming.responses import (
+    TRICKPLAY_CONTENT_TYPES,
+    delivery_response,
+    get_segment_content_type,
+    is_not_modified,
+)
+from content.utils.video_processing import TRICKPLAY_DIR, get_hls_dir
+
+
+@api_view(["POST"])
+@permission_classes([IsAuthenticated])
+def start_playback(request, movie_id):
+    """
+    Endpoint: /api/video/<int:movie_id>/playback/
+    Issues a signed playback token for the video and returns its playlist URLs carrying it.
+    Playlists and segments requested with the token skip the JWT and user lookup.
+    """
+    video = get_object_or_404(Video, id=movie_id)
+    resolutions = list(
+        VideoQuality.objects.filter(video=video, processing_status="completed").values_list("resolution", flat=True)
+    )
+
+    if not resolutions:
+        return Response({"error": "Video not yet available"}, status=404)
+
+    token = create_playback_token(request.user.id, video.id)
+    query = urlencode({"token": token})
+
+    return Response(
+        {
+            "token": token,
+            "expires_in": settings.PLAYBACK_TOKEN_LIFETIME,
+            "playlists": {
+                resolution: f"/api/video/{video.id}/{resolution}/index.m3u8?{query}" for resolution in resolutions
+            },
+        }
+    )
 
 
 @api_view(["GET"])
+@authentication_classes([PlaybackTokenAuthentication, CookieJWTAuthentication])
 @permission_classes([IsAuthenticated])
 @cache_control(max_age=300)
 def hls_playlist(request, movie_id, resolution):
     """
     Endpoint: /api/video/<int:movie_id>/<str:resolution>/index.m3u8
     Returns HLS playlist for a specific movie and resolution.
+    Requested with a playback token, the token is carried over to the segment URIs.
+    """
+    playlist, error = load_playlist(movie_id, resolution)
+    if error:
+        return Response(*error)
+
+    playback_token = request.auth if isinstance(request.successful_authenticator, PlaybackTokenAuthentication) else None
+    return playlist_response(request, playlist, playback_token)
+
+
+@api_view(["GET"])
+@authentication_classes([PlaybackTokenAuthentication, StatelessCookieJWTAuthentication])
+@permission_classes([IsAuthenticated])
+def hls_segment(request, movie_id, resolution, segment_name):
+    """
+    Endpoint: /api/video/<int:movie_id>/<str:resolution>/<str:segment_name>/
+    Returns a single HLS video segment.
+    Authorized from the playback token or JWT and the rendition availability index, without database queries.
+    """
+    segment_path, content_type = get_segment_path(movie_id, resolution, segment_name)
+    return segment_response(request, segment_path, content_type)
+
+
+def load_playlist(movie_id, resolution):
+    """
+    Return the cached playlist of a completed rendition and None, or None and the
+    (data, status) of the error response. Raises Http404 for unknown videos or renditions.
     """
     video = get_object_or_404(Video, id=movie_id)
     quality = get_object_or_404(VideoQuality, video=video, resolution=resolution)
 
     if quality.processing_status != "completed":
-        return Response({"error": "Video not yet available"}, status=404)
-
-    playlist_path = os.path.join(settings.MEDIA_ROOT, "hls", str(movie_id), resolution, "index.m3u8")
-
-    if not os.path.exists(playlist_path):
-        raise Http404("Playlist not found")
+        return None, ({"error": "Video not yet available"}, 404)
 
     try:
-        with open(playlist_path, "r", encoding="utf-8") as f:
-            playlist_content = f.read()
+        playlist = playlists.get_rewritten_playlist(video, resolution)
+    except IOError:
+        return None, ({"error": "Error reading playlist"}, 500)
 
-        lines = playlist_content.split("\n")
-        modified_lines = []
+    if playlist is None:
+        raise Http404("Playlist not found")
 
-        for line in lines:
-            if line.endswith(".ts"):
-                segment_name = line.strip()
-                api_url = f"/api/video/{movie_id}/{resolution}/{segment_name}"
-                modified_lines.append(api_url)
-            else:
-                modified_lines.append(line)
+    return playlist, None
 
-        modified_playlist = "\n".join(modified_lines)
 
-        response = HttpResponse(modified_playlist, content_type="application/vnd.apple.mpegurl")
+def playlist_response(request, playlist, playback_token=None):
+    """Build the playlist response, 304 if the client's copy is current."""
+    if playback_token is not None:
+        playlist = playlists.with_playback_token(playlist, playback_token)
 
-        response["Access-Control-Allow-Origin"] = "*"
-        response["Access-Control-Allow-Methods"] = "GET"
-        response["Access-Control-Allow-Headers"] = "Content-Type"
+    mtime = playlist.get("mtime")
+    if is_not_modified(request, playlist["etag"], mtime):
+        response = HttpResponse(status=304)
+    else:
+        response = HttpResponse(playlist["content"], content_type="application/vnd.apple.mpegurl")
 
-        return response
+    response["ETag"] = playlist["etag"]
+    if mtime is not None:
+        response["Last-Modified"] = http_date(mtime)
+    response["Access-Control-Allow-Origin"] = "*"
+    response["Access-Control-Allow-Methods"] = "GET"
+    response["Access-Control-Allow-Headers"] = "Content-Type, If-None-Match, If-Modified-Since"
+    response["Access-Control-Expose-Headers"] = "ETag, Last-Modified"
 
-    except IOError:
-        return Response({"error": "Error reading playlist"}, status=500)
+    return response
 
 
-@api_view(["GET"])
-@permission_classes([IsAuthenticated])
-@cache_control(max_age=3600)
-def hls_segment(request, movie_id, resolution, segment_name):
+def get_segment_path(movie_id, resolution, segment_name):
     """
-    Endpoint: /api/video/<int:movie_id>/<str:resolution>/<str:segment_name>/
-    Returns a single HLS video segment.
+    Resolve a segment of an available rendition to its file path and content type from the
+    availability index, raising Http404 for invalid names and unavailable renditions.
     """
-    video = get_object_or_404(Video, id=movie_id)
-    quality = get_object_or_404(VideoQuality, video=video, resolution=resolution)
+    content_type = get_valid_segment_content_type(segment_name)
+    hls_dir_id = availability.get_available_hls_dir_id(movie_id, resolution)
+    return build_segment_path(hls_dir_id, resolution, segment_name), content_type
 
-    if quality.processing_status != "completed":
-        raise Http404("Video not yet available")
 
-    if not segment_name.endswith(".ts"):
+def get_valid_segment_content_type(segment_name):
+    """Content type of a segment name, raising Http404 for unknown types and path traversal."""
+    content_type = get_segment_content_type(segment_name)
+    if content_type is None:
         raise Http404("Invalid segment name")
 
     if ".." in segment_name or "/" in segment_name or "\\" in segment_name:
         raise Http404("Invalid segment name")
 
-    segment_path = os.path.join(settings.MEDIA_ROOT, "hls", str(movie_id), resolution, segment_name)
+    return content_type
 
-    if not os.path.exists(segment_path):
-        raise Http404("Segment not found")
 
-    expected_dir = os.path.join(settings.MEDIA_ROOT, "hls", str(movie_id), resolution)
+def build_segment_path(hls_dir_id, resolution, segment_name):
+    """File path of a segment in the HLS directory, raising Http404 if the rendition is unavailable."""
+    if not hls_dir_id:
+        raise Http404("Video not yet available")
+
+    expected_dir = os.path.join(settings.MEDIA_ROOT, "hls", str(hls_dir_id), resolution)
+    segment_path = os.path.join(expected_dir, segment_name)
+
     if not os.path.commonpath([segment_path, expected_dir]) == expected_dir:
         raise Http404("Invalid path")
 
+    return segment_path
+
+
+def segment_response(request, segment_path, content_type, asynchronous=False):
+    """
+    Deliver a segment file with its CORS headers. Segment names are reused by re-encodes, only
+    URLs carrying the encode version of the playlist (SEGMENT_VERSION_PARAM) are cached as immutable.
+    """
     try:
-        response = FileResponse(open(segment_path, "rb"), content_type="video/mp2t")
+        response = delivery_response(request, segment_path, content_type, asynchronous)
+        if request.GET.get(playlists.SEGMENT_VERSION_PARAM):
+            patch_cache_control(response, max_age=31536000, immutable=True)
+        else:
+            patch_cache_control(response, max_age=300)
 
         response["Access-Control-Allow-Origin"] = "*"
         response["Access-Control-Allow-Methods"] = "GET"
-        response["Access-Control-Allow-Headers"] = "Content-Type"
-        response["Accept-Ranges"] = "bytes"
+        response["Access-Control-Allow-Headers"] = "Content-Type, Range, If-Range, If-None-Match, If-Modified-Since"
+        response["Access-Control-Expose-Headers"] = "Content-Range, Content-Length, ETag, Last-Modified"
 
         return response
 
+    except FileNotFoundError:
+        raise Http404("Segment not found")
+
     except IOError:
         raise Http404("Error reading segment")
+
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+@cache_control(max_age=604800, private=True)
+def trickplay_file(request, movie_id, file_name):
+    """
+    Endpoint: /api/video/<int:movie_id>/trickplay/<str:file_name>
+    Returns the WebVTT seek preview index or one of its sprite sheets.
+    """
+    content_type = TRICKPLAY_CONTENT_TYPES.get(os.path.splitext(file_name)[1])
+    if content_type is None or ".." in file_name or "/" in file_name or "\\" in file_name:
+        raise Http404("Invalid file name")
+
+    video = get_object_or_404(Video, id=movie_id)
+
+    trickplay_dir = os.path.join(get_hls_dir(video), TRICKPLAY_DIR)
+    file_path = os.path.join(trickplay_dir, file_name)
+
+    if not os.path.exists(file_path):
+        raise Http404("Trickplay file not found")
+
+    response = delivery_response(request, file_path, content_type)
+    response["Access-Control-Allow-Origin"] = "*"
+    response["Access-Control-Allow-Methods"] = "GET"
+    response["Access-Control-Allow-Headers"] = "Content-Type"
+
+    return response
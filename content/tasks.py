@@ -1,4 +1,5 @@
 import os
+import django_rq
 from django_rq import job
 from django.core.files.storage import default_storage
 from django.core.files.base import ContentFile
@@ -9,16 +10,63 @@ import tempfile
 import logging
 import math
 
+from rq.job import Dependency
 
 from core.settings import SITE_URL
+from core.utils.tasks import DEFAULT_RETRY, TRANSCODE_RETRY, is_last_attempt
 from content.models import Video, VideoQuality
-from content.utils import video_processing
+from content.utils import deduplication, video_processing
 
 
 logger = logging.getLogger(__name__)
 
 
-@job("default", timeout=300)
+class IncompleteTranscodeError(Exception):
+    """Raised after a transcode left failed renditions, so RQ retries the job."""
+
+
+@job("media", timeout=600, retry=DEFAULT_RETRY)
+def ingest_video_task(video_id):
+    """
+    Inspect a new upload once in the background, then start thumbnailing and transcoding.
+    Uploads with the same content hash as a completed video reuse its HLS output.
+    """
+    video = Video.objects.get(id=video_id)
+    if not video.video_file:
+        return False
+
+    try:
+        video_processing.probe_media_info(video)
+    except Exception as e:
+        video_processing.set_prossesing_status(video, "failed")
+        logger.error(f"Error when probing the media info of {video.title}: {e}")
+        raise
+
+    deduplication.compute_content_hash(video)
+
+    logger.info(f"Media info of {video.title} stored, start thumbnail generation")
+    generate_video_thumbnail.delay(video.id)
+
+    duplicate = deduplication.find_hls_duplicate(video)
+    if duplicate:
+        deduplication.reuse_hls_output(video, duplicate)
+        return True
+
+    if settings.VIDEO_PER_TITLE_ENCODING:
+        try:
+            video_processing.probe_complexity(video)
+        except ffmpeg.Error as e:
+            logger.error(
+                f"Error at the complexity probe of {video.title}, using the default ladder: {e.stderr.decode()}"
+            )
+
+    logger.info(f"Media info of {video.title} stored, start Generating different resolutions")
+    process_video_task.delay(video.id)
+
+    return True
+
+
+@job("media", timeout=300, retry=DEFAULT_RETRY)
 def generate_video_thumbnail(video_id):
     """
     Generate thumbnail with python-ffmpeg
@@ -30,20 +78,20 @@ def generate_video_thumbnail(video_id):
         if not video.video_file:
             return False
 
-        temp_video_path = video_processing.create_temporary_file_mp4(video)
+        source_path, is_temporary = video_processing.get_video_source(video)
         temp_thumb_path = video_processing.create_temporary_file_thumbnail()
-        timestamp = video_processing.set_timestamp(temp_video_path)
 
         try:
-            video_processing.generate_thumbnail_try(video, temp_video_path, temp_thumb_path, timestamp)
+            timestamp = video_processing.set_timestamp(video)
+            video_processing.generate_thumbnail_try(video, source_path, temp_thumb_path, timestamp)
 
         except Exception as e:
             logger.error(f"Error: {str(e)}")
             return False
 
         finally:
-            if os.path.exists(temp_video_path):
-                os.unlink(temp_video_path)
+            if is_temporary and os.path.exists(source_path):
+                os.unlink(source_path)
             if os.path.exists(temp_thumb_path):
                 os.unlink(temp_thumb_path)
 
@@ -54,7 +102,7 @@ def generate_video_thumbnail(video_id):
         return False
 
 
-@job("default", timeout=14400)
+@job("transcode", timeout=14400, retry=TRANSCODE_RETRY)
 def process_video_task(video_id):
     """
     Generating different resolutions in hls format
@@ -63,41 +111,324 @@ def process_video_task(video_id):
     try:
         video_processing.set_prossesing_status(video, "processing")
 
-        resolutions = video_processing.get_resolutions()
-
         input_path = video.video_file.path
-        base_output_dir = os.path.join(settings.MEDIA_ROOT, "hls", str(video.id))
+        source = video_processing.get_media_info(video)
+        resolutions = video_processing.get_resolutions(source)
+
+        base_output_dir = video_processing.get_base_output_dir(video)
         os.makedirs(base_output_dir, exist_ok=True)
 
-        master_playlist_content = "#EXTM3U\n#EXT-X-VERSION:3\n\n"
+        master_playlist_content = video_processing.get_master_playlist_header()
+
+        video.qualities.exclude(resolution__in=resolutions.keys()).delete()
 
+        qualities = {}
         for resolution, config in resolutions.items():
-            quality, created = VideoQuality.objects.get_or_create(
-                video=video, resolution=resolution, defaults={"bitrate": int(config["bitrate"].replace("k", ""))}
+            qualities[resolution] = video_processing.get_or_create_quality(video, resolution, config)
+
+        if settings.VIDEO_TRANSCODE_MODE == "chunked" and can_encode_in_chunks(video):
+            fan_out_chunks(video, qualities, base_output_dir)
+            return
+
+        if settings.VIDEO_TRANSCODE_MODE in ("parallel", "chunked"):
+            fan_out_renditions(video, qualities, base_output_dir)
+            return
+
+        if settings.VIDEO_TRANSCODE_MODE == "single_pass":
+            master_playlist_content = transcode_single_pass(
+                video, resolutions, base_output_dir, input_path, qualities, master_playlist_content
+            )
+        else:
+            master_playlist_content = transcode_sequential(
+                video, resolutions, base_output_dir, input_path, qualities, master_playlist_content
             )
 
-            video_processing.set_prossesing_status(quality, "processing")
+        # The shared audio rendition is one of the qualities, without it the renditions would be silent
+        failed = [resolution for resolution, quality in qualities.items() if quality.processing_status != "completed"]
+        if failed:
+            # The video keeps processing while RQ retries the failed renditions and fails with the last attempt
+            if is_last_attempt():
+                video_processing.set_prossesing_status(video, "failed")
+            raise IncompleteTranscodeError(f"Renditions {', '.join(failed)} of {video.title} failed")
+
+        video_processing.write_master_playlist(base_output_dir, master_playlist_content)
+
+        video_processing.set_prossesing_status(video, "completed")
+        logger.info(f"Master-Playlist for {video.title} successfully created.")
+
+    except IncompleteTranscodeError:
+        raise
+
+    except Exception as e:
+
+        video_processing.set_prossesing_status(video, "failed")
+        logger.error(f"Error while processing the video: {e}")
+
+
+@job("transcode", timeout=14400, retry=TRANSCODE_RETRY)
+def process_video_quality_task(video_id, resolution, trickplay=False):
+    """
+    Generating a single resolution in hls format, optionally with the trickplay sprites
+    """
+    video = Video.objects.get(id=video_id)
+    quality = VideoQuality.objects.get(video=video, resolution=resolution)
+    config = video_processing.get_quality_config(quality)
+
+    base_output_dir = video_processing.get_base_output_dir(video)
+    os.makedirs(base_output_dir, exist_ok=True)
+
+    if video_processing.is_rendition_complete(video, quality, base_output_dir):
+        logger.info(f"Rendition {resolution} of {video.title} already completed, skipping.")
+        return
+
+    video_processing.set_prossesing_status(quality, "processing")
+
+    try:
+
+        video_processing.try_generate_video_quality(
+            video, resolution, config, base_output_dir, video.video_file.path, quality, "", trickplay
+        )
+
+    except ffmpeg.Error as e:
+
+        video_processing.set_prossesing_status(quality, "failed")
+
+        logger.error(f"Error at {resolution}: stderr:\n{e.stderr.decode()}")
+        raise
+
+
+@job("transcode", timeout=3600, retry=TRANSCODE_RETRY)
+def encode_chunk_task(video_id, resolution, index, start, length):
+    """
+    Encoding one time range of a single resolution in hls format
+    """
+    video = Video.objects.get(id=video_id)
+    quality = VideoQuality.objects.get(video=video, resolution=resolution)
+    config = video_processing.get_quality_config(quality)
+
+    base_output_dir = video_processing.get_base_output_dir(video)
+    resolution_dir = os.path.join(base_output_dir, resolution)
+
+    if video_processing.is_chunk_complete(resolution_dir, index):
+        logger.info(f"Chunk {index} of {resolution} of {video.title} already completed, skipping.")
+        return
+
+    try:
+
+        video_processing.try_generate_chunk(
+            video, resolution, config, base_output_dir, video.video_file.path, index, start, length
+        )
+
+    except ffmpeg.Error as e:
+
+        logger.error(f"Error at chunk {index} of {resolution}: stderr:\n{e.stderr.decode()}")
+        raise
+
+
+@job("media", timeout=300, retry=DEFAULT_RETRY)
+def stitch_rendition_task(video_id, resolution, chunk_count):
+    """
+    Join the encoded chunks of a resolution into one continuous media playlist
+    """
+    video = Video.objects.get(id=video_id)
+    quality = VideoQuality.objects.get(video=video, resolution=resolution)
+    base_output_dir = video_processing.get_base_output_dir(video)
+
+    if not video_processing.stitch_chunks(video, quality, base_output_dir, chunk_count):
+        video_processing.set_prossesing_status(quality, "failed")
+        logger.error(f"Chunks of {resolution} of {video.title} are missing, rendition failed.")
 
-            try:
 
-                master_playlist_content = video_processing.try_generate_video_quality(
-                    video, resolution, config, base_output_dir, input_path, quality, master_playlist_content
-                )
+@job("transcode", timeout=14400, retry=TRANSCODE_RETRY)
+def generate_trickplay_task(video_id):
+    """
+    Generating the trickplay sprites on their own when no single encode covers the whole video
+    """
+    video = Video.objects.get(id=video_id)
+    base_output_dir = video_processing.get_base_output_dir(video)
+
+    try:
+
+        video_processing.try_generate_trickplay(video, base_output_dir, video.video_file.path)
 
-            except ffmpeg.Error as e:
+    except ffmpeg.Error as e:
 
+        logger.error(f"Error at trickplay of {video.title}: stderr:\n{e.stderr.decode()}")
+        raise
+
+
+@job("media", timeout=300, retry=DEFAULT_RETRY)
+def finalize_video_task(video_id):
+    """
+    Build the master playlist once every rendition job has succeeded or failed
+    """
+    video = Video.objects.get(id=video_id)
+    try:
+        qualities = video.qualities.order_by("height", "id")
+        master_playlist_content = video_processing.get_master_playlist_header()
+        completed = 0
+
+        for quality in qualities:
+            if quality.processing_status == "completed":
+                config = video_processing.get_quality_config(quality)
+                master_playlist_content += video_processing.get_master_playlist_entry(video, quality.resolution, config)
+                completed += 1
+            elif quality.processing_status != "failed":
                 video_processing.set_prossesing_status(quality, "failed")
 
-                logger.error(f"Error at {resolution}: stderr:\n{e.stderr.decode()}")
+        if video_processing.is_shared_audio_missing(video):
+            video_processing.set_prossesing_status(video, "failed")
+            logger.error(f"Shared audio of {video.title} failed, not publishing its silent renditions.")
+            return
 
-        master_playlist_path = os.path.join(base_output_dir, "master.m3u8")
-        with open(master_playlist_path, "w") as f:
-            f.write(master_playlist_content)
+        base_output_dir = video_processing.get_base_output_dir(video)
+        os.makedirs(base_output_dir, exist_ok=True)
+        video_processing.write_master_playlist(base_output_dir, master_playlist_content)
 
-        video_processing.set_prossesing_status(video, "completed")
-        logger.info(f"Master-Playlist for {video.title} successfully created.")
+        video_processing.set_prossesing_status(video, "completed" if completed else "failed")
+        logger.info(f"Master-Playlist for {video.title} created with {completed}/{len(qualities)} renditions.")
 
     except Exception as e:
 
         video_processing.set_prossesing_status(video, "failed")
-        logger.error(f"Error while processing the video: {e}")
+        logger.error(f"Error while finalizing the video: {e}")
+
+
+def fan_out_renditions(video, qualities, base_output_dir):
+    """
+    Enqueue one job per unfinished rendition and a finalizer job that depends on all of them.
+    """
+    trickplay_rendition = video_processing.get_trickplay_rendition(
+        {resolution: video_processing.get_quality_config(quality) for resolution, quality in qualities.items()}
+    )
+
+    rendition_jobs = [
+        process_video_quality_task.delay(video.id, resolution, resolution == trickplay_rendition)
+        for resolution, quality in qualities.items()
+        if not video_processing.is_rendition_complete(video, quality, base_output_dir)
+    ]
+
+    if not rendition_jobs:
+        finalize_video_task.delay(video.id)
+        return
+
+    finalize_video_task.delay(video.id, depends_on=Dependency(jobs=rendition_jobs, allow_failure=True))
+    logger.info(f"Enqueued {len(rendition_jobs)} rendition jobs for {video.title}.")
+
+
+def can_encode_in_chunks(video):
+    """Chunks are stitched from MPEG-TS playlists and need a known duration, otherwise renditions run whole."""
+    if settings.VIDEO_HLS_SEGMENT_FORMAT != "mpegts" or not video_processing.get_media_info(video).duration:
+        logger.info(f"Chunked encoding not possible for {video.title}, falling back to one job per rendition.")
+        return False
+    return True
+
+
+def fan_out_chunks(video, qualities, base_output_dir):
+    """
+    Enqueue one job per time range of every unfinished video rendition, a stitch job per rendition
+    depending on its chunks and a finalizer depending on all stitch jobs. The shared audio
+    rendition and the trickplay sprites are encoded whole in their own jobs.
+    """
+    chunk_ranges = video_processing.get_chunk_ranges(video_processing.get_media_info(video).duration)
+    rendition_jobs = []
+
+    for resolution, quality in qualities.items():
+        if video_processing.is_rendition_complete(video, quality, base_output_dir):
+            continue
+
+        if resolution == video_processing.AUDIO_RENDITION:
+            rendition_jobs.append(process_video_quality_task.delay(video.id, resolution))
+            continue
+
+        if quality.processing_status == "pending":
+            video_processing.prepare_rendition_dir(base_output_dir, resolution)
+        video_processing.set_prossesing_status(quality, "processing")
+
+        chunk_jobs = [
+            encode_chunk_task.delay(video.id, resolution, index, start, length)
+            for index, (start, length) in enumerate(chunk_ranges)
+        ]
+        rendition_jobs.append(
+            stitch_rendition_task.delay(
+                video.id, resolution, len(chunk_ranges), depends_on=Dependency(jobs=chunk_jobs, allow_failure=True)
+            )
+        )
+
+    if rendition_jobs and settings.VIDEO_TRICKPLAY:
+        rendition_jobs.append(generate_trickplay_task.delay(video.id))
+
+    if not rendition_jobs:
+        finalize_video_task.delay(video.id)
+        return
+
+    finalize_video_task.delay(video.id, depends_on=Dependency(jobs=rendition_jobs, allow_failure=True))
+    logger.info(f"Enqueued {len(chunk_ranges)} chunks per rendition of {video.title}.")
+
+
+def transcode_sequential(video, resolutions, base_output_dir, input_path, qualities, master_playlist_content):
+    """Run one ffmpeg process per unfinished resolution, the lowest one also writes the trickplay sprites."""
+    trickplay_rendition = video_processing.get_trickplay_rendition(resolutions)
+
+    for resolution, config in resolutions.items():
+        quality = qualities[resolution]
+
+        if video_processing.is_rendition_complete(video, quality, base_output_dir):
+            logger.info(f"Rendition {resolution} of {video.title} already completed, skipping.")
+            master_playlist_content += video_processing.get_master_playlist_entry(video, resolution, config)
+            continue
+
+        video_processing.set_prossesing_status(quality, "processing")
+
+        try:
+
+            master_playlist_content = video_processing.try_generate_video_quality(
+                video,
+                resolution,
+                config,
+                base_output_dir,
+                input_path,
+                quality,
+                master_playlist_content,
+                resolution == trickplay_rendition,
+            )
+
+        except ffmpeg.Error as e:
+
+            video_processing.set_prossesing_status(quality, "failed")
+
+            logger.error(f"Error at {resolution}: stderr:\n{e.stderr.decode()}")
+
+    return master_playlist_content
+
+
+def transcode_single_pass(video, resolutions, base_output_dir, input_path, qualities, master_playlist_content):
+    """Decode the source once and write all unfinished resolutions in a single ffmpeg process."""
+    pending = {
+        resolution: config
+        for resolution, config in resolutions.items()
+        if not video_processing.is_rendition_complete(video, qualities[resolution], base_output_dir)
+    }
+
+    for resolution in pending:
+        video_processing.set_prossesing_status(qualities[resolution], "processing")
+
+    if pending:
+        try:
+
+            video_processing.try_generate_video_qualities_single_pass(
+                video, pending, base_output_dir, input_path, qualities, ""
+            )
+
+        except ffmpeg.Error as e:
+
+            for resolution in pending:
+                video_processing.set_prossesing_status(qualities[resolution], "failed")
+
+            logger.error(f"Error at single pass transcode of {', '.join(pending)}: stderr:\n{e.stderr.decode()}")
+
+    for resolution, config in resolutions.items():
+        if qualities[resolution].processing_status == "completed":
+            master_playlist_content += video_processing.get_master_playlist_entry(video, resolution, config)
+
+    return master_playlist_content
@@ -1,3 +1,346 @@
-from django.test import TestCase
+import os
+import time
+import shutil
+import tempfile
 
-# Create your tests here.
+from unittest import mock
+
+from django.core import signing
+from django.core.cache import cache
+from django.db.models.signals import post_save
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.request import Request
+
+from content import signals
+from content.models import Video, VideoQuality
+from content.streaming import availability
+from content.streaming.authentication import PlaybackTokenAuthentication
+from content.streaming.responses import parse_range_header, ranged_file_response
+from content.streaming.tokens import create_playback_token, verify_playback_token
+
+
+LOCMEM_CACHES = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+
+
+class HLSOutputTestCase(TestCase):
+    """Videos with HLS output written to a temporary MEDIA_ROOT, without running the ingest."""
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        settings_override = override_settings(MEDIA_ROOT=self.media_root, CACHES=LOCMEM_CACHES)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+
+        post_save.disconnect(signals.video_post_save, sender=Video)
+        self.addCleanup(post_save.connect, signals.video_post_save, sender=Video)
+
+    def create_video(self, title, hls_source=None, resolutions=("360p",)):
+        video = Video.objects.create(title=title, description="", processing_status="completed", hls_source=hls_source)
+        for resolution in resolutions:
+            VideoQuality.objects.create(
+                video=video,
+                resolution=resolution,
+                width=640,
+                height=360,
+                bitrate=800,
+                hls_playlist_path=f"hls/{(hls_source or video).id}/{resolution}/index.m3u8",
+                processing_status="completed",
+            )
+        return video
+
+    def write_rendition(self, video_id, resolution="360p"):
+        rendition_dir = os.path.join(self.media_root, "hls", str(video_id), resolution)
+        os.makedirs(rendition_dir)
+        for name in ("index.m3u8", "000.ts"):
+            with open(os.path.join(rendition_dir, name), "w") as f:
+                f.write(name)
+
+    def hls_path(self, video_id, *parts):
+        return os.path.join(self.media_root, "hls", str(video_id), *parts)
+
+
+class BulkDeleteSharedHLSOutputTests(HLSOutputTestCase):
+    """Deleting videos that share HLS output through hls_source keeps the output of the survivors."""
+
+    def setUp(self):
+        super().setUp()
+
+        # The first copy is created before its owner, so bulk deletes visit it first
+        self.early_copy = self.create_video("early copy")
+        self.owner = self.create_video("owner")
+        self.write_rendition(self.owner.id)
+        Video.objects.filter(id=self.early_copy.id).update(hls_source=self.owner)
+        self.early_copy.qualities.update(hls_playlist_path=f"hls/{self.owner.id}/360p/index.m3u8")
+        self.copies = [self.create_video(f"copy {i}", hls_source=self.owner) for i in range(2)]
+
+    def assert_owns_output(self, video):
+        video.refresh_from_db()
+        self.assertIsNone(video.hls_source_id)
+        self.assertTrue(os.path.exists(self.hls_path(video.id, "360p", "000.ts")))
+        self.assertEqual(video.qualities.get().hls_playlist_path, f"hls/{video.id}/360p/index.m3u8")
+
+    def assert_uses_output_of(self, video, owner):
+        video.refresh_from_db()
+        self.assertEqual(video.hls_source_id, owner.id)
+        self.assertEqual(video.qualities.get().hls_playlist_path, f"hls/{owner.id}/360p/index.m3u8")
+
+    def test_bulk_delete_owner_and_copy_hands_output_to_survivor(self):
+        Video.objects.filter(id__in=[self.owner.id, self.copies[0].id]).delete()
+
+        self.assert_owns_output(self.early_copy)
+        self.assert_uses_output_of(self.copies[1], self.early_copy)
+        self.assertFalse(os.path.exists(self.hls_path(self.owner.id)))
+        self.assertFalse(os.path.exists(self.hls_path(self.copies[0].id)))
+
+    def test_bulk_delete_copy_visited_before_owner_hands_output_to_survivor(self):
+        Video.objects.filter(id__in=[self.early_copy.id, self.owner.id]).delete()
+
+        self.assert_owns_output(self.copies[0])
+        self.assert_uses_output_of(self.copies[1], self.copies[0])
+        self.assertFalse(os.path.exists(self.hls_path(self.owner.id)))
+        self.assertFalse(os.path.exists(self.hls_path(self.early_copy.id)))
+
+    def test_bulk_delete_of_all_sharing_videos_removes_output(self):
+        Video.objects.all().delete()
+
+        self.assertEqual(os.listdir(self.hls_path("")), [])
+
+
+class DeletedRenditionFilesTests(HLSOutputTestCase):
+    """Deleting a rendition removes its HLS-files unless a video reusing the output still mirrors it."""
+
+    def setUp(self):
+        super().setUp()
+        self.video = self.create_video("video", resolutions=("360p", "720p"))
+        self.write_rendition(self.video.id, "360p")
+        self.write_rendition(self.video.id, "720p")
+
+    def test_delete_rendition_removes_its_directory(self):
+        self.video.qualities.exclude(resolution="360p").delete()
+
+        self.assertFalse(os.path.exists(self.hls_path(self.video.id, "720p")))
+        self.assertTrue(os.path.exists(self.hls_path(self.video.id, "360p", "000.ts")))
+
+    def test_delete_rendition_mirrored_by_copy_keeps_its_directory(self):
+        self.create_video("copy", hls_source=self.video, resolutions=("720p",))
+
+        self.video.qualities.exclude(resolution="360p").delete()
+
+        self.assertTrue(os.path.exists(self.hls_path(self.video.id, "720p", "000.ts")))
+
+    def test_delete_mirrored_rendition_of_copy_keeps_source_directory(self):
+        copy = self.create_video("copy", hls_source=self.video, resolutions=("720p",))
+
+        copy.qualities.all().delete()
+
+        self.assertTrue(os.path.exists(self.hls_path(self.video.id, "720p", "000.ts")))
+
+
+class RangedFileResponseTests(SimpleTestCase):
+    """Byte ranges and conditional requests of files served by Django."""
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+
+        self.data = bytes(range(256)) * 4
+        self.path = os.path.join(self.media_root, "segment.ts")
+        with open(self.path, "wb") as f:
+            f.write(self.data)
+
+        self.factory = RequestFactory()
+
+    def get(self, **headers):
+        return ranged_file_response(self.factory.get("/", **headers), self.path, "video/mp2t")
+
+    def get_body(self, response):
+        return b"".join(response.streaming_content) if response.streaming else response.content
+
+    def test_parse_range_header(self):
+        self.assertEqual(parse_range_header("bytes=0-9", 1024), [(0, 9)])
+        self.assertEqual(parse_range_header("bytes=1000-", 1024), [(1000, 1023)])
+        self.assertEqual(parse_range_header("bytes=-4", 1024), [(1020, 1023)])
+        self.assertEqual(parse_range_header("bytes=-4000", 1024), [(0, 1023)])
+        self.assertEqual(parse_range_header("bytes=1000-5000", 1024), [(1000, 1023)])
+        self.assertEqual(parse_range_header("bytes=0-1, 5000-6000, 1020-", 1024), [(0, 1), (1020, 1023)])
+
+    def test_parse_range_header_without_satisfiable_range(self):
+        self.assertIs(parse_range_header("bytes=5000-", 1024), False)
+        self.assertIs(parse_range_header("bytes=1024-, 9-3", 1024), False)
+
+    def test_parse_range_header_ignores_invalid_headers(self):
+        for header in (
+            None,
+            "",
+            "items=0-1",
+            "bytes=a-b",
+            "bytes=-",
+            "bytes=0-1;2-3",
+            "bytes=" + ",".join(["0-1"] * 17),
+        ):
+            with self.subTest(header=header):
+                self.assertIsNone(parse_range_header(header, 1024))
+
+    def test_single_range(self):
+        response = self.get(HTTP_RANGE="bytes=10-19")
+
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response["Content-Range"], "bytes 10-19/1024")
+        self.assertEqual(response["Content-Length"], "10")
+        self.assertEqual(self.get_body(response), self.data[10:20])
+
+    def test_multiple_ranges_content_length_matches_body(self):
+        response = self.get(HTTP_RANGE="bytes=0-1, 5000-6000, 1020-")
+        body = self.get_body(response)
+
+        self.assertEqual(response.status_code, 206)
+        self.assertTrue(response["Content-Type"].startswith("multipart/byteranges; boundary="))
+        self.assertEqual(int(response["Content-Length"]), len(body))
+        self.assertIn(b"Content-Range: bytes 0-1/1024\r\n\r\n" + self.data[0:2] + b"\r\n", body)
+        self.assertIn(b"Content-Range: bytes 1020-1023/1024\r\n\r\n" + self.data[1020:] + b"\r\n", body)
+        self.assertTrue(body.endswith(b"--\r\n"))
+
+    def test_unsatisfiable_range_is_416(self):
+        response = self.get(HTTP_RANGE="bytes=5000-")
+
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response["Content-Range"], "bytes */1024")
+
+    def test_invalid_range_is_ignored(self):
+        response = self.get(HTTP_RANGE="items=0-1")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.get_body(response), self.data)
+
+    def test_if_range_only_applies_range_for_current_validators(self):
+        response = self.get()
+        etag, last_modified = response["ETag"], response["Last-Modified"]
+
+        self.assertEqual(self.get(HTTP_RANGE="bytes=0-1", HTTP_IF_RANGE=etag).status_code, 206)
+        self.assertEqual(self.get(HTTP_RANGE="bytes=0-1", HTTP_IF_RANGE=last_modified).status_code, 206)
+        self.assertEqual(self.get(HTTP_RANGE="bytes=0-1", HTTP_IF_RANGE='"old"').status_code, 200)
+        self.assertEqual(self.get(HTTP_RANGE="bytes=0-1", HTTP_IF_RANGE=f"W/{etag}").status_code, 200)
+
+    def test_if_none_match_uses_weak_comparison(self):
+        etag = self.get()["ETag"]
+
+        for if_none_match in (etag, f"W/{etag}", f'"other", W/{etag}', "*"):
+            with self.subTest(if_none_match=if_none_match):
+                response = self.get(HTTP_IF_NONE_MATCH=if_none_match)
+                self.assertEqual(response.status_code, 304)
+                self.assertEqual(response["ETag"], etag)
+
+        self.assertEqual(self.get(HTTP_IF_NONE_MATCH='"other"').status_code, 200)
+
+    def test_if_modified_since_only_without_if_none_match(self):
+        last_modified = self.get()["Last-Modified"]
+
+        self.assertEqual(self.get(HTTP_IF_MODIFIED_SINCE=last_modified).status_code, 304)
+        self.assertEqual(self.get(HTTP_IF_MODIFIED_SINCE="Thu, 01 Jan 1970 00:00:00 GMT").status_code, 200)
+        response = self.get(HTTP_IF_NONE_MATCH='"other"', HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 200)
+
+
+@override_settings(PLAYBACK_TOKEN_LIFETIME=60)
+class PlaybackTokenTests(SimpleTestCase):
+    """Signed playback tokens grant one user access to the HLS files of one video until they expire."""
+
+    def authenticate(self, token, movie_id):
+        request = Request(
+            RequestFactory().get("/", {"token": token}), parser_context={"kwargs": {"movie_id": movie_id}}
+        )
+        return PlaybackTokenAuthentication().authenticate(request)
+
+    def test_token_returns_user_of_its_video(self):
+        self.assertEqual(verify_playback_token(create_playback_token(7, 1), 1), "7")
+
+    def test_token_is_rejected_for_another_video(self):
+        with self.assertRaises(signing.BadSignature):
+            verify_playback_token(create_playback_token(7, 1), 2)
+
+    def test_tampered_token_is_rejected(self):
+        token = create_playback_token(7, 1)
+        with self.assertRaises(signing.BadSignature):
+            verify_playback_token(token.replace("1:7", "1:8", 1), 1)
+
+    def test_expired_token_is_rejected(self):
+        token = create_playback_token(7, 1)
+        with mock.patch("django.core.signing.time.time", return_value=time.time() + 61):
+            with self.assertRaises(signing.SignatureExpired):
+                verify_playback_token(token, 1)
+
+    def test_authentication_builds_token_user(self):
+        token = create_playback_token(7, 1)
+        user, auth = self.authenticate(token, 1)
+
+        self.assertEqual(user.id, "7")
+        self.assertTrue(user.is_authenticated)
+        self.assertEqual(auth, token)
+
+    def test_authentication_rejects_token_of_another_video(self):
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate(create_playback_token(7, 1), 2)
+
+    def test_authentication_without_token_is_skipped(self):
+        request = Request(RequestFactory().get("/"), parser_context={"kwargs": {"movie_id": 1}})
+        self.assertIsNone(PlaybackTokenAuthentication().authenticate(request))
+
+
+class PlaybackTokenSegmentTests(HLSOutputTestCase):
+    """Segments are served for a playback token of their own video only."""
+
+    def setUp(self):
+        super().setUp()
+        self.video = self.create_video("video")
+        self.other_video = self.create_video("other video")
+        self.write_rendition(self.video.id)
+
+    def get_segment(self, token):
+        url = reverse("content-hls:hls_segment", args=[self.video.id, "360p", "000.ts"])
+        return self.client.get(url, {"token": token})
+
+    def test_segment_is_served_for_token_of_the_video(self):
+        response = self.get_segment(create_playback_token(1, self.video.id))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b"".join(response.streaming_content), b"000.ts")
+
+    def test_segment_is_rejected_for_token_of_another_video(self):
+        response = self.get_segment(create_playback_token(1, self.other_video.id))
+
+        self.assertEqual(response.status_code, 403)
+
+
+class RenditionAvailabilityTests(HLSOutputTestCase):
+    """The availability index read by hls_segment follows the renditions in the database."""
+
+    def setUp(self):
+        super().setUp()
+        self.video = self.create_video("video")
+        self.quality = self.video.qualities.get()
+
+    def test_cache_miss_is_filled_from_database(self):
+        availability.remove_rendition_availability(self.quality)
+
+        self.assertEqual(availability.get_available_hls_dir_id(self.video.id, "360p"), self.video.id)
+        self.assertEqual(availability.get_cached_hls_dir_id(self.video.id, "360p"), self.video.id)
+
+    def test_stale_read_does_not_overwrite_newer_state(self):
+        stale_quality = VideoQuality.objects.select_related("video").get(pk=self.quality.pk)
+        stale_quality.processing_status = "processing"
+        availability.remove_rendition_availability(self.quality)
+
+        # The worker completes the rendition after the request read it as processing
+        self.quality.save()
+        availability.store_rendition_availability(stale_quality, cache.add)
+
+        self.assertEqual(availability.get_available_hls_dir_id(self.video.id, "360p"), self.video.id)
+
+    def test_unavailable_rendition_is_not_served(self):
+        self.quality.processing_status = "processing"
+        self.quality.save()
+
+        self.assertIsNone(availability.get_available_hls_dir_id(self.video.id, "360p"))
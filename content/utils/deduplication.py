@@ -0,0 +1,139 @@
+import os
+import shutil
+import hashlib
+import logging
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import QuerySet
+
+from content.models import Video, VideoQuality
+from content.utils import video_processing
+
+
+logger = logging.getLogger(__name__)
+
+# Bytes of the video file hashed at once
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def compute_content_hash(video):
+    """Stream the video file through SHA-256 in bounded chunks and store the digest on the video."""
+    digest = hashlib.sha256()
+    with video.video_file.open("rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+
+    video.content_hash = digest.hexdigest()
+    video.save(update_fields=["content_hash"])
+    return video.content_hash
+
+
+def find_hls_duplicate(video):
+    """Completed video with the same content that owns its HLS output, None if there is none."""
+    if not video.content_hash:
+        return None
+
+    return (
+        Video.objects.filter(content_hash=video.content_hash, processing_status="completed", hls_source__isnull=True)
+        .exclude(id=video.id)
+        .order_by("id")
+        .first()
+    )
+
+
+def reuse_hls_output(video, source):
+    """Point the video at the HLS output of its duplicate and mirror the completed renditions."""
+    with transaction.atomic():
+        video.qualities.all().delete()
+        VideoQuality.objects.bulk_create(
+            [
+                VideoQuality(
+                    video=video,
+                    resolution=quality.resolution,
+                    width=quality.width,
+                    height=quality.height,
+                    bitrate=quality.bitrate,
+                    hls_playlist_path=quality.hls_playlist_path,
+                    processing_status="completed",
+                )
+                for quality in source.qualities.filter(processing_status="completed")
+            ]
+        )
+        video.hls_source = source
+        video.processing_status = "completed"
+        video.has_trickplay = source.has_trickplay
+        video.save(update_fields=["hls_source", "processing_status", "has_trickplay"])
+
+    logger.info(f"{video.title} has the same content as {source.title}, reusing its HLS output.")
+
+
+def get_hls_source_id(video_id):
+    """Current hls_source_id of a video from the database, instances of a bulk delete may be stale."""
+    return Video.objects.filter(pk=video_id).values_list("hls_source_id", flat=True).first()
+
+
+def get_deleted_video_ids(instance, origin):
+    """
+    Ids of all videos removed by the delete that triggered a signal, so output is never handed
+    to a video of the same batch. origin is the deleted queryset or instance.
+    """
+    if isinstance(origin, QuerySet) and origin.model is Video:
+        return set(origin.values_list("id", flat=True)) | {instance.id}
+    return {instance.id}
+
+
+def rehome_hls_output(video, deleted_ids=()):
+    """
+    Hand the HLS output of a video that is about to be deleted to the first video reusing it
+    that is not deleted with it, so the output survives as long as any video references it.
+    Expects a current hls_source_id, see get_hls_source_id.
+    """
+    if video.hls_source_id is not None:
+        return None
+
+    with transaction.atomic():
+        copies = list(
+            Video.objects.select_for_update().filter(hls_source_id=video.id).exclude(id__in=deleted_ids).order_by("id")
+        )
+        if not copies:
+            return None
+
+        owner, others = copies[0], copies[1:]
+        old_dir = os.path.join(settings.MEDIA_ROOT, "hls", str(video.id))
+        new_dir = os.path.join(settings.MEDIA_ROOT, "hls", str(owner.id))
+
+        Video.objects.filter(id=owner.id).update(hls_source=None)
+        Video.objects.filter(id__in=[copy.id for copy in others]).update(hls_source=owner)
+        for quality in VideoQuality.objects.filter(video__in=copies):
+            quality.hls_playlist_path = f"hls/{owner.id}/{quality.resolution}/index.m3u8"
+            quality.save(update_fields=["hls_playlist_path"])
+
+        if os.path.exists(old_dir):
+            shutil.rmtree(new_dir, ignore_errors=True)
+            shutil.move(old_dir, new_dir)
+
+    owner.hls_source = None
+    video_processing.rebuild_master_playlist(owner)
+    logger.info(f"HLS output of {video.title} moved to {owner.title}, still used by {len(copies)} videos.")
+    return owner
+
+
+def is_hls_output_referenced(video):
+    """
+    Check whether the HLS directory of the video is used by another video. hls_source_id must
+    be current, video_pre_delete refreshes it from the database before the row is gone.
+    """
+    if video.hls_source_id:
+        return True
+    return Video.objects.filter(hls_source_id=video.id).exists()
+
+
+def is_rendition_output_referenced(quality):
+    """
+    Check whether the rendition directory of a deleted quality is not its own, because the video
+    reuses another HLS output, or is still mirrored by a video reusing the HLS output of this one.
+    """
+    if get_hls_source_id(quality.video_id):
+        return True
+    return VideoQuality.objects.filter(video__hls_source_id=quality.video_id, resolution=quality.resolution).exists()
@@ -0,0 +1,128 @@
+import os
+import json
+import time
+import socket
+import logging
+import threading
+
+import ffmpeg
+from django_redis import get_redis_connection
+
+
+logger = logging.getLogger(__name__)
+
+# Seconds between two progress updates of a running encode
+PUBLISH_INTERVAL = 2
+
+# Seconds without an update after which a running encode counts as stalled
+STALLED_AFTER = 120
+
+# Progress hashes expire a day after the last update
+PROGRESS_TIMEOUT = 60 * 60 * 24
+
+
+def get_progress_key(video_id):
+    """Redis hash holding the progress of every rendition of a video."""
+    return f"videoflix:transcode-progress:{video_id}"
+
+
+def run_with_progress(stream, video, rendition):
+    """
+    Run an ffmpeg stream like ffmpeg.run(quiet=True) while publishing its
+    -progress output (out_time, fps, speed) for the video/rendition to Redis.
+    """
+    process = (
+        stream.global_args("-progress", "pipe:1", "-nostats")
+        .overwrite_output()
+        .run_async(pipe_stdout=True, pipe_stderr=True)
+    )
+
+    stderr = []
+    stderr_reader = threading.Thread(target=lambda: stderr.append(process.stderr.read()), daemon=True)
+    stderr_reader.start()
+
+    duration = video.duration.total_seconds() if video.duration else None
+    latest = {"status": "running"}
+    last_published = 0
+    block = {}
+
+    for line in process.stdout:
+        key, _, value = line.decode(errors="replace").strip().partition("=")
+        block[key] = value
+
+        if key == "progress":
+            latest = parse_progress_block(block, duration)
+            block = {}
+
+            if time.monotonic() - last_published >= PUBLISH_INTERVAL:
+                publish_progress(video.id, rendition, latest)
+                last_published = time.monotonic()
+
+    process.wait()
+    stderr_reader.join()
+
+    if process.returncode:
+        publish_progress(video.id, rendition, {**latest, "status": "failed"})
+        raise ffmpeg.Error("ffmpeg", None, b"".join(stderr))
+
+    publish_progress(video.id, rendition, {**latest, "status": "completed", "percent": 100.0})
+
+
+def parse_progress_block(block, duration):
+    """Convert one block of ffmpeg -progress key=value lines into telemetry."""
+    out_time = parse_float(block.get("out_time_us"))
+    out_time = out_time / 1_000_000 if out_time is not None else None
+
+    progress = {
+        "status": "running",
+        "frame": parse_float(block.get("frame")),
+        "fps": parse_float(block.get("fps")),
+        "speed": parse_float(block.get("speed", "").rstrip("x")),
+        "out_time": out_time,
+        "percent": None,
+    }
+
+    if out_time is not None and duration:
+        progress["percent"] = round(min(out_time / duration * 100, 100.0), 1)
+
+    return progress
+
+
+def parse_float(value):
+    """Parse ffmpeg numbers, None for 'N/A' or missing values."""
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def publish_progress(video_id, rendition, progress):
+    """Store the progress of a rendition, tagged with the worker and the update time."""
+    progress["worker"] = f"{socket.gethostname()}:{os.getpid()}"
+    progress["updated_at"] = time.time()
+
+    try:
+        connection = get_redis_connection("default")
+        pipeline = connection.pipeline()
+        pipeline.hset(get_progress_key(video_id), rendition, json.dumps(progress))
+        pipeline.expire(get_progress_key(video_id), PROGRESS_TIMEOUT)
+        pipeline.execute()
+    except Exception as e:
+        logger.warning(f"Could not publish transcode progress for video {video_id}: {e}")
+
+
+def get_video_progress(video_id):
+    """Return the progress of all renditions of a video, flagging stalled encodes."""
+    try:
+        entries = get_redis_connection("default").hgetall(get_progress_key(video_id))
+    except Exception as e:
+        logger.warning(f"Could not read transcode progress for video {video_id}: {e}")
+        return {}
+
+    renditions = {}
+    for rendition, value in entries.items():
+        progress = json.loads(value)
+        progress["stalled"] = progress["status"] == "running" and time.time() - progress["updated_at"] > STALLED_AFTER
+        renditions[rendition.decode()] = progress
+
+    return renditions
@@ -0,0 +1,169 @@
+import os
+import uuid
+import logging
+
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+from django.utils.text import get_valid_filename
+
+from content.models import Video, VideoUpload
+
+
+logger = logging.getLogger(__name__)
+
+# Bytes read from the request and written to disk at once
+CHUNK_SIZE = 1024 * 1024
+
+# Container signatures as (offset, magic bytes): MP4/MOV, Matroska/WebM, MPEG-PS, FLV, Ogg, ASF/WMV.
+# AVI (a RIFF subtype) and MPEG-TS (sync byte every 188 bytes) are checked in is_video_header.
+VIDEO_SIGNATURES = (
+    (4, b"ftyp"),
+    (0, b"\x1a\x45\xdf\xa3"),
+    (0, b"\x00\x00\x01\xba"),
+    (0, b"FLV"),
+    (0, b"OggS"),
+    (0, b"\x30\x26\xb2\x75\x8e\x66\xcf\x11"),
+)
+
+# Seconds the append lock of an upload survives without a chunk arriving, frees uploads of crashed workers
+UPLOAD_LOCK_TIMEOUT = 60
+
+# An MPEG-TS header needs the sync byte at the start of at least two and up to this many packets
+MPEG_TS_PACKET_SIZE = 188
+MPEG_TS_SYNC_PACKETS = 5
+
+
+class NotAVideoError(Exception):
+    """Raised when the first bytes of an upload match no known video container."""
+
+
+class UploadOffsetError(Exception):
+    """Raised when a chunk does not start at the current offset of the upload."""
+
+
+class UploadLockedError(Exception):
+    """Raised when another request is appending to the upload."""
+
+
+def get_upload_file_name(upload):
+    """Final storage name of an upload, keeping the extension of the original filename."""
+    extension = os.path.splitext(get_valid_filename(upload.filename))[1].lower()
+    return f"videos/{upload.id}{extension}"
+
+
+def is_video_header(data):
+    """Check the container header of the first chunk against the known video signatures."""
+    if data[:4] == b"RIFF":
+        return data[8:12] == b"AVI "
+
+    if data[:1] == b"\x47":
+        sync_offsets = range(0, min(len(data), MPEG_TS_PACKET_SIZE * MPEG_TS_SYNC_PACKETS), MPEG_TS_PACKET_SIZE)
+        return len(data) > MPEG_TS_PACKET_SIZE and all(data[offset] == 0x47 for offset in sync_offsets)
+
+    return any(data.startswith(magic, offset) for offset, magic in VIDEO_SIGNATURES)
+
+
+@contextmanager
+def append_lock(upload):
+    """
+    Hold the append lock of an upload in the cache, so only one request writes to its file.
+    No database transaction stays open during the upload. Yields a callable that extends
+    the lock by UPLOAD_LOCK_TIMEOUT, raises UploadLockedError if another request holds it.
+    """
+    key = f"upload-lock:{upload.id}"
+    token = uuid.uuid4().hex
+    if not cache.add(key, token, UPLOAD_LOCK_TIMEOUT):
+        raise UploadLockedError("Another request is appending to this upload")
+
+    try:
+        yield lambda: cache.touch(key, UPLOAD_LOCK_TIMEOUT)
+    finally:
+        if cache.get(key) == token:
+            cache.delete(key)
+
+
+def append_chunks(upload, stream, content_length, offset, keep_alive):
+    """
+    Append the request body to the upload file in bounded chunks, starting at offset.
+    The offset is stored even if the client disconnects midway, so the upload can resume.
+    The caller holds the append_lock of the upload, keep_alive extends it with every chunk.
+    """
+    if offset != upload.offset:
+        raise UploadOffsetError(f"Expected offset {upload.offset}, got {offset}")
+
+    remaining = min(content_length, upload.length - upload.offset)
+    path = os.path.join(settings.MEDIA_ROOT, upload.file_name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    with open(path, "r+b" if os.path.exists(path) else "wb") as file:
+        file.truncate(upload.offset)
+        file.seek(upload.offset)
+
+        try:
+            while remaining > 0:
+                try:
+                    chunk = stream.read(min(CHUNK_SIZE, remaining))
+                except OSError:
+                    logger.info(f"Client disconnected during upload {upload.id} at offset {file.tell()}")
+                    break
+
+                if not chunk:
+                    break
+
+                if file.tell() == 0 and not is_video_header(chunk):
+                    raise NotAVideoError(f"{upload.filename} is not a video file")
+
+                file.write(chunk)
+                remaining -= len(chunk)
+                keep_alive()
+
+        finally:
+            file.flush()
+            stored = store_offset(upload, file.tell())
+
+    if not stored:
+        raise UploadLockedError("Another request appended to this upload")
+
+
+def store_offset(upload, offset):
+    """
+    Move the stored offset of the upload from the value it was read with to offset. The update
+    only applies if no other request changed the offset meanwhile, e.g. after an expired lock.
+    """
+    updated = VideoUpload.objects.filter(pk=upload.pk, offset=upload.offset).update(
+        offset=offset, updated_at=timezone.now()
+    )
+    if updated:
+        upload.offset = offset
+    return bool(updated)
+
+
+def reject_upload(upload):
+    """Mark an upload as failed and remove its partial file."""
+    upload.status = "failed"
+    upload.save(update_fields=["status", "updated_at"])
+
+    path = os.path.join(settings.MEDIA_ROOT, upload.file_name)
+    if os.path.exists(path):
+        os.unlink(path)
+
+
+def complete_upload(upload):
+    """Create the Video row for a fully received upload, which starts the ingest."""
+    with transaction.atomic():
+        video = Video.objects.create(
+            title=upload.title,
+            description=upload.description,
+            category=upload.category,
+            video_file=upload.file_name,
+        )
+        upload.video = video
+        upload.status = "completed"
+        upload.save(update_fields=["video", "status", "updated_at"])
+
+    logger.info(f"Upload {upload.id} completed as Video {video.title}")
+    return video
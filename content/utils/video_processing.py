@@ -3,52 +3,118 @@ from django_rq import job
 from django.core.files.storage import default_storage
 from django.core.files.base import ContentFile
 from django.conf import settings
+from django.db.models import Q
 
 import ffmpeg
 import tempfile
 import logging
 import math
+import shutil
+import statistics
+
+from datetime import timedelta
 
 from core.settings import SITE_URL
-from content.models import Video, VideoQuality
+from content.models import Video, VideoQuality, VideoMediaInfo
+from content.utils import progress
 
 
 logger = logging.getLogger(__name__)
 
+# fMP4 segments and byte ranges need a newer HLS version than MPEG-TS
+HLS_VERSIONS = {"mpegts": 3, "fmp4": 7}
+
+# Rendition holding the shared audio group, see uses_shared_audio
+AUDIO_RENDITION = "audio"
+AUDIO_BITRATE = "128k"
+
+# Target duration of a HLS segment in seconds, chunk boundaries are multiples of it
+HLS_SEGMENT_DURATION = 15
+
+# Seconds added to all output timestamps. It exceeds the encoder delay (B-frames, AAC priming),
+# so no output starts with negative timestamps that the muxer would shift: renditions,
+# the shared audio and every chunk then start exactly at their position in the source
+HLS_TIMESTAMP_OFFSET = 1
+
+# Complexity probe: constant quality sample encodes at the reference rendition,
+# compared with its ladder bitrate and clamped to the factor range
+COMPLEXITY_SAMPLES = 3
+COMPLEXITY_SAMPLE_LENGTH = 4
+COMPLEXITY_CRF = 23
+COMPLEXITY_REFERENCE = {"height": 720, "width": 1280, "bitrate": 2500}
+COMPLEXITY_FACTOR_RANGE = (0.4, 1.6)
+
+# Seconds a finished rendition may fall short of the source duration
+PLAYLIST_DURATION_TOLERANCE = 2.0
+
+# Trickplay sprite sheets: 160px wide frames tiled 5x5 per image, indexed by a WebVTT file
+TRICKPLAY_DIR = "trickplay"
+TRICKPLAY_VTT = "thumbnails.vtt"
+TRICKPLAY_WIDTH = 160
+TRICKPLAY_COLUMNS = 5
+TRICKPLAY_ROWS = 5
+
 
 def create_temporary_file_mp4(video):
-    """Create a temporary file for the video in mp4 format."""
+    """Copy the video into a temporary mp4 file in bounded chunks."""
     with tempfile.NamedTemporaryFile(suffix=".mp4", delete=False) as temp_video:
         video.video_file.open("rb")
-        temp_video.write(video.video_file.read())
+        for chunk in video.video_file.chunks():
+            temp_video.write(chunk)
         video.video_file.close()
         return temp_video.name
 
 
+def get_video_source(video):
+    """
+    Return an input ffmpeg can seek in directly: the stored file on local storage,
+    its URL on storage served over HTTP, otherwise a chunked temporary copy.
+    The second value tells whether the input is a temporary file.
+    """
+    try:
+        return video.video_file.path, False
+    except NotImplementedError:
+        pass
+
+    url = video.video_file.url
+    if url.startswith(("http://", "https://")):
+        return url, False
+
+    return create_temporary_file_mp4(video), True
+
+
 def create_temporary_file_thumbnail():
     """Create a temporary file for the thumbnail."""
     with tempfile.NamedTemporaryFile(suffix=".jpg", delete=False) as temp_thumb:
         return temp_thumb.name
 
 
-def set_timestamp(temp_video_path):
-    """Set a timestamp for the thumbnail generation."""
-    metadata = ffmpeg.probe(temp_video_path)
-    duration = float(metadata["format"]["duration"])
+def set_timestamp(video):
+    """Set a timestamp for the thumbnail generation from the stored duration of the video."""
+    if video.duration:
+        duration = video.duration.total_seconds()
+    else:
+        duration = get_media_info(video).duration or 0
+
     timestamp = 20 if duration >= 20 else 1
     return timestamp
 
 
-def generate_thumbnail_try(video, temp_video_path, temp_thumb_path, timestamp):
-    """Generate a thumbnail for the video."""
+def render_thumbnail(source_path, temp_thumb_path, timestamp):
+    """Seek straight to the timestamp and write a single 640px frame."""
     (
-        ffmpeg.input(temp_video_path, ss=timestamp)
+        ffmpeg.input(source_path, ss=timestamp)
         .filter("scale", 640, -1)
         .output(temp_thumb_path, vframes=1, **{"q:v": 2})
         .overwrite_output()
         .run(quiet=True)
     )
 
+
+def generate_thumbnail_try(video, source_path, temp_thumb_path, timestamp):
+    """Generate a thumbnail for the video."""
+    render_thumbnail(source_path, temp_thumb_path, timestamp)
+
     thumbnail_filename = f"thumbnails/{str(video.id)}/{video.title}.jpg"
 
     with open(temp_thumb_path, "rb") as thumb_file:
@@ -62,68 +128,736 @@ def generate_thumbnail_try(video, temp_video_path, temp_thumb_path, timestamp):
         logger.info(f"Thumbnail for video {video.title} successfully generated: {thumbnail_url}")
 
 
+def get_master_playlist_header():
+    """Return the master playlist header for the configured segment format."""
+    return f"#EXTM3U\n#EXT-X-VERSION:{HLS_VERSIONS[settings.VIDEO_HLS_SEGMENT_FORMAT]}\n\n"
+
+
+def get_segment_pattern(resolution_dir):
+    """
+    MPEG-TS writes one file per segment, fMP4 packs all segments of a
+    rendition into a single file addressed with byte ranges.
+    """
+    if settings.VIDEO_HLS_SEGMENT_FORMAT == "fmp4":
+        return os.path.join(resolution_dir, "stream.mp4")
+    return os.path.join(resolution_dir, "%03d.ts")
+
+
+def get_hls_dir(video):
+    """HLS directory of a video, which is the one of its hls_source when it reuses a duplicate."""
+    return os.path.join(settings.MEDIA_ROOT, "hls", str(video.hls_source_id or video.id))
+
+
+def get_base_output_dir(video):
+    """Return the directory holding all HLS files of the video."""
+    return get_hls_dir(video)
+
+
+def write_master_playlist(base_output_dir, master_playlist_content):
+    """Write the master playlist next to the resolution directories."""
+    master_playlist_path = os.path.join(base_output_dir, "master.m3u8")
+    with open(master_playlist_path, "w") as f:
+        f.write(master_playlist_content)
+
+
+def rebuild_master_playlist(video):
+    """Write the master playlist of a video from its completed renditions."""
+    master_playlist_content = get_master_playlist_header()
+    for quality in video.qualities.filter(processing_status="completed").order_by("height", "id"):
+        master_playlist_content += get_master_playlist_entry(video, quality.resolution, get_quality_config(quality))
+
+    base_output_dir = get_base_output_dir(video)
+    os.makedirs(base_output_dir, exist_ok=True)
+    write_master_playlist(base_output_dir, master_playlist_content)
+
+
 def set_prossesing_status(video, status):
     """Set the processing status of the video."""
     video.processing_status = status
     video.save()
 
 
-def get_resolutions():
-    """Define the resolutions for video processing."""
-    return {
+def get_resolutions(source=None):
+    """
+    Define the resolutions for video processing.
+    With the VideoMediaInfo of the source the ladder is fitted to it, see fit_resolutions_to_source.
+    """
+    resolutions = {
         "480p": {"height": 480, "bitrate": "1600k"},
         "720p": {"height": 720, "bitrate": "2500k"},
         "1080p": {"height": 1080, "bitrate": "5000k"},
     }
 
+    if source is None:
+        return resolutions
+
+    resolutions = fit_resolutions_to_source(resolutions, source)
+
+    if uses_shared_audio() and source.has_audio:
+        return {AUDIO_RENDITION: {"audio": True, "bitrate": AUDIO_BITRATE}, **resolutions}
+
+    return resolutions
+
+
+def fit_resolutions_to_source(resolutions, source):
+    """
+    Drop renditions above the source height, keep the source aspect ratio and
+    cap every bitrate at the source bitrate. With per-title encoding the bitrates are scaled
+    by the complexity factor of the source. Sources below the smallest rendition
+    get a single rendition at their own height, with the bitrate scaled by pixel count.
+    """
+    fitted = {}
+
+    for resolution, config in resolutions.items():
+        if config["height"] <= source.height:
+            fitted[resolution] = get_source_rendition_config(config["height"], config["bitrate"], source)
+
+    if not fitted:
+        height = source.height - source.height % 2
+        smallest = next(iter(resolutions.values()))
+        bitrate = int(int(smallest["bitrate"].replace("k", "")) * (height / smallest["height"]) ** 2)
+        fitted[f"{height}p"] = get_source_rendition_config(height, f"{bitrate}k", source)
+
+    return fitted
+
+
+def get_source_rendition_config(height, bitrate, source):
+    """Build the config for a single rendition of the given source."""
+    bitrate = int(bitrate.replace("k", ""))
+
+    if settings.VIDEO_PER_TITLE_ENCODING and source.complexity_factor:
+        bitrate = int(bitrate * source.complexity_factor)
+
+    if source.frame_rate and source.frame_rate > 30:
+        bitrate = int(bitrate * 1.5)
+
+    if source.bitrate:
+        bitrate = min(bitrate, source.bitrate)
+
+    width = round(height * source.width / source.height / 2) * 2
+
+    return {"height": height, "width": width, "bitrate": f"{bitrate}k"}
+
+
+def get_or_create_quality(video, resolution, config):
+    """
+    Get or create the VideoQuality row of a rendition.
+    A row recorded with a different ladder is reset to pending so it gets encoded again.
+    """
+    ladder = {
+        "bitrate": int(config["bitrate"].replace("k", "")),
+        "width": config.get("width"),
+        "height": config.get("height"),
+    }
+    quality, created = VideoQuality.objects.get_or_create(video=video, resolution=resolution, defaults=ladder)
+
+    if not created and any(getattr(quality, field) != value for field, value in ladder.items()):
+        for field, value in ladder.items():
+            setattr(quality, field, value)
+        set_prossesing_status(quality, "pending")
+
+    return quality
+
+
+def is_rendition_complete(video, quality, base_output_dir):
+    """
+    Validate a completed rendition on disk before it is skipped: the playlist must be
+    finished, every segment must exist and the segments must cover the source duration.
+    """
+    if quality.processing_status != "completed":
+        return False
+
+    resolution_dir = os.path.join(base_output_dir, quality.resolution)
+    playlist = parse_media_playlist(os.path.join(resolution_dir, "index.m3u8"))
+
+    if playlist is None or not playlist["finished"]:
+        return False
+
+    for segment_name in playlist["segments"]:
+        segment_path = os.path.join(resolution_dir, segment_name)
+        if not os.path.isfile(segment_path) or os.path.getsize(segment_path) == 0:
+            return False
+
+    if video.duration and playlist["duration"] < video.duration.total_seconds() - PLAYLIST_DURATION_TOLERANCE:
+        return False
+
+    return True
+
+
+def parse_media_playlist(playlist_path):
+    """Read the segment files in order, total duration and end marker of a media playlist."""
+    try:
+        with open(playlist_path, "r", encoding="utf-8") as f:
+            lines = [line.strip() for line in f]
+    except OSError:
+        return None
+
+    playlist = {"finished": "#EXT-X-ENDLIST" in lines, "duration": 0.0, "segments": set(), "entries": []}
+    segment_duration = None
+
+    for line in lines:
+        if line.startswith("#EXTINF:"):
+            segment_duration = float(line.split(":", 1)[1].split(",")[0])
+            playlist["duration"] += segment_duration
+        elif line.startswith("#EXT-X-MAP:"):
+            playlist["segments"].add(line.split('URI="', 1)[1].split('"', 1)[0])
+        elif line and not line.startswith("#"):
+            playlist["segments"].add(line)
+            playlist["entries"].append((segment_duration, line))
+
+    return playlist
+
+
+def prepare_rendition_dir(base_output_dir, resolution):
+    """Create an empty directory for a rendition, dropping leftovers of an earlier attempt."""
+    resolution_dir = os.path.join(base_output_dir, resolution)
+    shutil.rmtree(resolution_dir, ignore_errors=True)
+    os.makedirs(resolution_dir, exist_ok=True)
+    return resolution_dir
+
+
+def get_quality_config(quality):
+    """Rebuild the rendition config recorded on a VideoQuality row."""
+    if quality.resolution == AUDIO_RENDITION:
+        return {"audio": True, "bitrate": f"{quality.bitrate}k"}
+
+    return {"height": quality.height, "width": quality.width, "bitrate": f"{quality.bitrate}k"}
+
+
+def get_media_info(video):
+    """Return the stored media info of the video, probing the source only if it is missing."""
+    try:
+        return video.media_info
+    except VideoMediaInfo.DoesNotExist:
+        return probe_media_info(video)
+
+
+def probe_media_info(video):
+    """
+    Probe the source once for streams, codecs, display dimensions, frame rate, bitrate and the
+    keyframe interval (from the packets of the first minute), store it on a VideoMediaInfo
+    row and the duration on the video.
+    """
+    metadata = ffmpeg.probe(
+        video.video_file.path, show_entries="packet=stream_index,pts_time,flags", read_intervals="%+60"
+    )
+    video_stream = next(stream for stream in metadata["streams"] if stream["codec_type"] == "video")
+    audio_stream = next((stream for stream in metadata["streams"] if stream["codec_type"] == "audio"), None)
+
+    width, height = int(video_stream["width"]), int(video_stream["height"])
+    sample_aspect_ratio = parse_ratio(video_stream.get("sample_aspect_ratio"))
+    if sample_aspect_ratio:
+        width = int(width * sample_aspect_ratio)
+
+    # ffmpeg autorotates on decode, the ladder and scale filters work on the displayed frame
+    rotation = get_rotation(video_stream)
+    if rotation % 180 == 90:
+        width, height = height, width
+
+    bitrate = video_stream.get("bit_rate") or metadata["format"].get("bit_rate")
+    duration = metadata["format"].get("duration")
+
+    media_info, created = VideoMediaInfo.objects.update_or_create(
+        video=video,
+        defaults={
+            "format_name": metadata["format"].get("format_name", ""),
+            "duration": float(duration) if duration else None,
+            "width": width,
+            "height": height,
+            "rotation": rotation,
+            "frame_rate": parse_ratio(video_stream.get("avg_frame_rate"))
+            or parse_ratio(video_stream.get("r_frame_rate")),
+            "bitrate": int(bitrate) // 1000 if bitrate else None,
+            "video_codec": video_stream.get("codec_name", ""),
+            "audio_codec": audio_stream.get("codec_name", "") if audio_stream else "",
+            "has_audio": audio_stream is not None,
+            "keyframe_interval": get_keyframe_interval(metadata.get("packets", []), video_stream["index"]),
+            "streams": metadata["streams"],
+        },
+    )
+
+    if media_info.duration:
+        video.duration = timedelta(seconds=media_info.duration)
+        video.save(update_fields=["duration"])
+
+    return media_info
+
+
+def get_rotation(video_stream):
+    """Display rotation in degrees (0, 90, 180 or 270) from the display matrix side data or the rotate tag."""
+    rotation = next(
+        (side_data["rotation"] for side_data in video_stream.get("side_data_list", []) if "rotation" in side_data),
+        video_stream.get("tags", {}).get("rotate", 0),
+    )
+    try:
+        return round(float(rotation) / 90) * 90 % 360
+    except (TypeError, ValueError):
+        return 0
+
+
+def get_keyframe_interval(packets, stream_index):
+    """Median distance in seconds between the keyframe packets of a stream."""
+    keyframe_times = sorted(
+        float(packet["pts_time"])
+        for packet in packets
+        if packet.get("stream_index") == stream_index and "K" in packet.get("flags", "") and "pts_time" in packet
+    )
+    intervals = [later - earlier for earlier, later in zip(keyframe_times, keyframe_times[1:])]
+
+    return round(statistics.median(intervals), 3) if intervals else None
+
+
+def parse_ratio(value):
+    """Parse ffprobe ratios like '30000/1001' or '16:9', None for unknown values."""
+    if not value:
+        return None
+
+    numerator, _, denominator = value.replace(":", "/").partition("/")
+    try:
+        numerator = float(numerator)
+        denominator = float(denominator or 1)
+    except ValueError:
+        return None
+
+    if not numerator or not denominator:
+        return None
+
+    return numerator / denominator
+
 
 def get_resolution_width(height):
     """Calculate width based on 16:9 aspect ratio"""
     return int(height * 16 / 9)
 
 
+def get_scale_filter_args(config):
+    """Scale to the rendition size, falling back to the source aspect ratio without a width."""
+    return (config.get("width") or -2, config["height"])
+
+
 def try_generate_video_quality(
-    video, resolution, config, base_output_dir, input_path, quality, master_playlist_content
+    video, resolution, config, base_output_dir, input_path, quality, master_playlist_content, trickplay=False
 ):
-    """Generate video quality for a specific resolution."""
-    resolution_dir = os.path.join(base_output_dir, resolution)
-    os.makedirs(resolution_dir, exist_ok=True)
+    """Generate video quality for a specific resolution, optionally with the trickplay sprites."""
+    resolution_dir = prepare_rendition_dir(base_output_dir, resolution)
 
     playlist_path = os.path.join(resolution_dir, "index.m3u8")
-    segment_pattern = os.path.join(resolution_dir, "%03d.ts")
+    segment_pattern = get_segment_pattern(resolution_dir)
+    trickplay_dir = prepare_trickplay_dir(video, base_output_dir) if trickplay else None
 
-    stream = stream_video(input_path, playlist_path, config, segment_pattern)
+    stream = stream_video(input_path, playlist_path, config, segment_pattern, video, trickplay_dir)
 
-    ffmpeg.run(stream, overwrite_output=True, quiet=True)
+    progress.run_with_progress(stream, video, resolution)
+
+    if trickplay_dir:
+        write_trickplay_vtt(video, trickplay_dir)
 
     quality.hls_playlist_path = f"hls/{video.id}/{resolution}/index.m3u8"
 
     set_prossesing_status(quality, "completed")
 
-    bandwidth = int(config["bitrate"].replace("k", "")) * 1000
-    master_playlist_content += f"#EXT-X-STREAM-INF:BANDWIDTH={bandwidth},RESOLUTION={get_resolution_width(config['height'])}x{config['height']}\n"
-    master_playlist_content += f"/api/video/{video.id}/{resolution}/index.m3u8\n\n"
+    return master_playlist_content + get_master_playlist_entry(video, resolution, config)
+
+
+def try_generate_video_qualities_single_pass(
+    video, resolutions, base_output_dir, input_path, qualities, master_playlist_content
+):
+    """Generate all video qualities with a single decode of the source, plus the trickplay sprites."""
+    renditions = []
+
+    for resolution, config in resolutions.items():
+        resolution_dir = prepare_rendition_dir(base_output_dir, resolution)
+
+        playlist_path = os.path.join(resolution_dir, "index.m3u8")
+        segment_pattern = get_segment_pattern(resolution_dir)
+        renditions.append((playlist_path, config, segment_pattern))
+
+    trickplay_dir = None
+    if get_trickplay_rendition(resolutions):
+        trickplay_dir = prepare_trickplay_dir(video, base_output_dir)
+
+    stream = stream_video_single_pass(input_path, renditions, video, trickplay_dir)
+
+    progress.run_with_progress(stream, video, "+".join(resolutions))
+
+    if trickplay_dir:
+        write_trickplay_vtt(video, trickplay_dir)
+
+    for resolution, config in resolutions.items():
+        quality = qualities[resolution]
+        quality.hls_playlist_path = f"hls/{video.id}/{resolution}/index.m3u8"
+
+        set_prossesing_status(quality, "completed")
+
+        master_playlist_content += get_master_playlist_entry(video, resolution, config)
 
     return master_playlist_content
 
 
-def stream_video(input_path, playlist_path, config, segment_pattern):
-    """Create a video stream for processing."""
-    stream = ffmpeg.input(input_path)
+def get_master_playlist_entry(video, resolution, config):
+    """
+    Build the master playlist entry for a single resolution. The shared audio
+    rendition becomes an EXT-X-MEDIA audio group referenced by the video renditions.
+    """
+    if config.get("audio"):
+        return (
+            f'#EXT-X-MEDIA:TYPE=AUDIO,GROUP-ID="{AUDIO_RENDITION}",NAME="Default",DEFAULT=YES,AUTOSELECT=YES,'
+            f'URI="/api/video/{video.id}/{resolution}/index.m3u8"\n\n'
+        )
+
+    bandwidth = int(config["bitrate"].replace("k", "")) * 1000
+    width = config.get("width") or get_resolution_width(config["height"])
+    audio_group = ""
+
+    if has_shared_audio(video):
+        bandwidth += int(AUDIO_BITRATE.replace("k", "")) * 1000
+        audio_group = f',AUDIO="{AUDIO_RENDITION}"'
+
+    entry = f"#EXT-X-STREAM-INF:BANDWIDTH={bandwidth},RESOLUTION={width}x{config['height']}{audio_group}\n"
+    entry += f"/api/video/{video.id}/{resolution}/index.m3u8\n\n"
+    return entry
+
+
+def uses_shared_audio():
+    """
+    Audio is encoded once as its own rendition with VIDEO_HLS_SHARED_AUDIO, and always for
+    chunked encoding: AAC encoded per chunk would overlap by its priming samples at every seam.
+    """
+    return settings.VIDEO_HLS_SHARED_AUDIO or settings.VIDEO_TRANSCODE_MODE == "chunked"
+
+
+def has_shared_audio(video):
+    """Check whether the video has a completed shared audio rendition."""
+    return (
+        uses_shared_audio()
+        and video.qualities.filter(resolution=AUDIO_RENDITION, processing_status="completed").exists()
+    )
+
+
+def is_shared_audio_missing(video):
+    """
+    Check whether the video has a shared audio rendition that did not complete. Its video
+    renditions are encoded without audio, published alone they would be silent.
+    """
+    return video.qualities.filter(resolution=AUDIO_RENDITION).exclude(processing_status="completed").exists()
+
+
+def get_output_options(config, segment_pattern):
+    """
+    Encoder and HLS muxer options shared by all transcode modes. With shared audio
+    the video renditions drop their audio track and the audio rendition its video.
+    """
+    options = {
+        "hls_time": HLS_SEGMENT_DURATION,
+        "hls_playlist_type": "vod",
+        "hls_segment_filename": segment_pattern,
+        "output_ts_offset": HLS_TIMESTAMP_OFFSET,
+        "f": "hls",
+    }
+
+    if config.get("audio"):
+        options.update({"acodec": "aac", "b:a": config["bitrate"], "vn": None})
+    elif uses_shared_audio():
+        options.update({"vcodec": "libx264", "b:v": config["bitrate"], "an": None})
+    else:
+        options.update({"vcodec": "libx264", "acodec": "aac", "b:v": config["bitrate"], "b:a": AUDIO_BITRATE})
+
+    if settings.VIDEO_HLS_SEGMENT_FORMAT == "fmp4":
+        options["hls_segment_type"] = "fmp4"
+        options["hls_flags"] = "single_file"
+
+    return options
+
+
+def stream_video(input_path, playlist_path, config, segment_pattern, video=None, trickplay_dir=None):
+    """Create a video stream for processing, with the trickplay sprites as a second output."""
+    if config.get("audio"):
+        return ffmpeg.output(
+            ffmpeg.input(input_path)["a"], playlist_path, **get_output_options(config, segment_pattern)
+        )
+
+    width, height = get_scale_filter_args(config)
+    source = ffmpeg.input(input_path)
     stream = ffmpeg.output(
-        stream,
+        source,
         playlist_path,
-        vcodec="libx264",
-        acodec="aac",
-        vf=f'scale=-2:{config["height"]}',
-        hls_time=15,
-        hls_playlist_type="vod",
-        hls_segment_filename=segment_pattern,
-        f="hls",
-        **{
-            "b:v": config["bitrate"],
-            "b:a": "128k",
-        },
+        vf=f"scale={width}:{height},setsar=1",
+        **get_output_options(config, segment_pattern),
     )
 
+    if trickplay_dir:
+        stream = ffmpeg.merge_outputs(stream, stream_trickplay(source.video, video, trickplay_dir))
+
     return stream
+
+
+def stream_video_single_pass(input_path, renditions, video=None, trickplay_dir=None):
+    """
+    Create one ffmpeg graph that decodes the source once, splits the video
+    and scales it to every rendition. A shared audio rendition is encoded once.
+    The trickplay sprites are taken from the same split.
+    """
+    source = ffmpeg.input(input_path)
+    video_renditions = [rendition for rendition in renditions if not rendition[1].get("audio")]
+
+    outputs = []
+    if video_renditions:
+        split = source.video.filter_multi_output("split", len(video_renditions) + bool(trickplay_dir))
+
+    if video_renditions and trickplay_dir:
+        outputs.append(stream_trickplay(split.stream(len(video_renditions)), video, trickplay_dir))
+
+    for index, (playlist_path, config, segment_pattern) in enumerate(video_renditions):
+        scaled = split.stream(index).filter("scale", *get_scale_filter_args(config)).filter("setsar", 1)
+        streams = [scaled] if uses_shared_audio() else [scaled, source["a?"]]
+        outputs.append(ffmpeg.output(*streams, playlist_path, **get_output_options(config, segment_pattern)))
+
+    for playlist_path, config, segment_pattern in renditions:
+        if config.get("audio"):
+            outputs.append(ffmpeg.output(source["a"], playlist_path, **get_output_options(config, segment_pattern)))
+
+    return ffmpeg.merge_outputs(*outputs)
+
+
+def get_trickplay_rendition(resolutions):
+    """The lowest video rendition, whose ffmpeg run also writes the trickplay sprites."""
+    if not settings.VIDEO_TRICKPLAY:
+        return None
+
+    return next((resolution for resolution, config in resolutions.items() if not config.get("audio")), None)
+
+
+def prepare_trickplay_dir(video, base_output_dir):
+    """Empty the trickplay directory, the video has no trickplay until write_trickplay_vtt finished."""
+    set_trickplay_available(video, False)
+    return prepare_rendition_dir(base_output_dir, TRICKPLAY_DIR)
+
+
+def set_trickplay_available(video, available):
+    """Record trickplay availability on the video and the videos reusing its HLS output."""
+    Video.objects.filter(Q(id=video.id) | Q(hls_source_id=video.id)).update(has_trickplay=available)
+    video.has_trickplay = available
+
+
+def get_trickplay_frame_size(video):
+    """Width and even height of a single trickplay frame, keeping the display aspect ratio."""
+    media_info = get_media_info(video)
+    height = round(TRICKPLAY_WIDTH * media_info.height / media_info.width / 2) * 2
+    return TRICKPLAY_WIDTH, height
+
+
+def stream_trickplay(video_stream, video, trickplay_dir):
+    """Sample one frame per interval and tile the frames into JPEG sprite sheets."""
+    width, height = get_trickplay_frame_size(video)
+    return ffmpeg.output(
+        video_stream.filter("fps", f"1/{settings.VIDEO_TRICKPLAY_INTERVAL}")
+        .filter("scale", width, height)
+        .filter("setsar", 1)
+        .filter("tile", f"{TRICKPLAY_COLUMNS}x{TRICKPLAY_ROWS}"),
+        os.path.join(trickplay_dir, "sprite-%03d.jpg"),
+        **{"q:v": 5},
+    )
+
+
+def write_trickplay_vtt(video, trickplay_dir):
+    """Write the WebVTT index mapping every interval of the video to its tile in a sprite sheet."""
+    width, height = get_trickplay_frame_size(video)
+    interval = settings.VIDEO_TRICKPLAY_INTERVAL
+    frames_per_sprite = TRICKPLAY_COLUMNS * TRICKPLAY_ROWS
+    duration = get_media_info(video).duration or 0
+
+    cues = ["WEBVTT", ""]
+    for index in range(math.ceil(duration / interval)):
+        sprite, tile = divmod(index, frames_per_sprite)
+        row, column = divmod(tile, TRICKPLAY_COLUMNS)
+        start, end = index * interval, min((index + 1) * interval, duration)
+
+        cues.append(f"{format_vtt_timestamp(start)} --> {format_vtt_timestamp(end)}")
+        cues.append(f"sprite-{sprite + 1:03d}.jpg#xywh={column * width},{row * height},{width},{height}")
+        cues.append("")
+
+    with open(os.path.join(trickplay_dir, TRICKPLAY_VTT), "w", encoding="utf-8") as f:
+        f.write("\n".join(cues))
+
+    set_trickplay_available(video, True)
+
+
+def format_vtt_timestamp(seconds):
+    """Format seconds as a WebVTT timestamp (hh:mm:ss.mmm)."""
+    milliseconds = round(seconds * 1000)
+    hours, milliseconds = divmod(milliseconds, 3_600_000)
+    minutes, milliseconds = divmod(milliseconds, 60_000)
+    return f"{hours:02d}:{minutes:02d}:{milliseconds / 1000:06.3f}"
+
+
+def get_chunk_ranges(duration):
+    """
+    Split the source into (start, length) time ranges for chunked encoding. The chunk length
+    is rounded up to whole segments, so chunk boundaries are segment boundaries.
+    """
+    segments_per_chunk = max(math.ceil(settings.VIDEO_CHUNK_DURATION / HLS_SEGMENT_DURATION), 1)
+    chunk_length = segments_per_chunk * HLS_SEGMENT_DURATION
+
+    return [(start, min(chunk_length, duration - start)) for start in range(0, math.ceil(duration), chunk_length)]
+
+
+def get_chunk_playlist_path(resolution_dir, index):
+    """Media playlist written by the encode of a single chunk."""
+    return os.path.join(resolution_dir, f"chunk_{index:04d}.m3u8")
+
+
+def is_chunk_complete(resolution_dir, index):
+    """Check that a chunk playlist is finished and all of its segments exist."""
+    playlist = parse_media_playlist(get_chunk_playlist_path(resolution_dir, index))
+    if playlist is None or not playlist["finished"]:
+        return False
+
+    return all(os.path.isfile(os.path.join(resolution_dir, segment)) for segment in playlist["segments"])
+
+
+def prepare_chunk(resolution_dir, index):
+    """Drop the playlist and segments of an earlier attempt at a chunk."""
+    prefix = f"c{index:04d}_"
+    for file_name in os.listdir(resolution_dir):
+        if file_name.startswith(prefix) or file_name == os.path.basename(
+            get_chunk_playlist_path(resolution_dir, index)
+        ):
+            os.unlink(os.path.join(resolution_dir, file_name))
+
+
+def try_generate_chunk(video, resolution, config, base_output_dir, input_path, index, start, length):
+    """
+    Encode the video of one time range of a rendition, the audio is the shared rendition.
+    Keyframes are forced at every segment boundary and the timestamps are shifted to the
+    position of the chunk in the source, see HLS_TIMESTAMP_OFFSET.
+    """
+    resolution_dir = os.path.join(base_output_dir, resolution)
+    os.makedirs(resolution_dir, exist_ok=True)
+    prepare_chunk(resolution_dir, index)
+
+    segment_pattern = os.path.join(resolution_dir, f"c{index:04d}_%03d.ts")
+    width, height = get_scale_filter_args(config)
+    options = {**get_output_options(config, segment_pattern), "output_ts_offset": start + HLS_TIMESTAMP_OFFSET}
+
+    stream = ffmpeg.output(
+        ffmpeg.input(input_path, ss=start, t=length),
+        get_chunk_playlist_path(resolution_dir, index),
+        vf=f"scale={width}:{height},setsar=1",
+        force_key_frames=f"expr:gte(t,n_forced*{HLS_SEGMENT_DURATION})",
+        **options,
+    )
+
+    progress.run_with_progress(stream, video, f"{resolution}:{index}")
+
+
+def stitch_chunks(video, quality, base_output_dir, chunk_count):
+    """
+    Join the chunk playlists of a rendition into its index.m3u8, returning False
+    if a chunk is missing. The chunk playlists are removed afterwards.
+    """
+    resolution_dir = os.path.join(base_output_dir, quality.resolution)
+    if not all(is_chunk_complete(resolution_dir, index) for index in range(chunk_count)):
+        return False
+
+    entries = []
+    for index in range(chunk_count):
+        entries += parse_media_playlist(get_chunk_playlist_path(resolution_dir, index))["entries"]
+
+    lines = [
+        "#EXTM3U",
+        f"#EXT-X-VERSION:{HLS_VERSIONS['mpegts']}",
+        f"#EXT-X-TARGETDURATION:{math.ceil(max(duration for duration, _ in entries))}",
+        "#EXT-X-MEDIA-SEQUENCE:0",
+        "#EXT-X-PLAYLIST-TYPE:VOD",
+    ]
+    for duration, segment_name in entries:
+        lines += [f"#EXTINF:{duration:.6f},", segment_name]
+    lines.append("#EXT-X-ENDLIST")
+
+    with open(os.path.join(resolution_dir, "index.m3u8"), "w", encoding="utf-8") as f:
+        f.write("\n".join(lines) + "\n")
+
+    for index in range(chunk_count):
+        os.unlink(get_chunk_playlist_path(resolution_dir, index))
+
+    quality.hls_playlist_path = f"hls/{video.id}/{quality.resolution}/index.m3u8"
+    set_prossesing_status(quality, "completed")
+    return True
+
+
+def try_generate_trickplay(video, base_output_dir, input_path):
+    """Decode the source only for the trickplay sprites, used when no rendition encode covers the whole video."""
+    trickplay_dir = prepare_trickplay_dir(video, base_output_dir)
+    stream = stream_trickplay(ffmpeg.input(input_path).video, video, trickplay_dir)
+
+    progress.run_with_progress(stream, video, TRICKPLAY_DIR)
+    write_trickplay_vtt(video, trickplay_dir)
+
+
+def probe_complexity(video):
+    """
+    Encode a few short samples spread over the source at a constant quality (CRF) and store
+    their bitrate relative to the ladder bitrate of the same size as the complexity factor.
+    """
+    media_info = get_media_info(video)
+    if not media_info.duration or not media_info.height:
+        return None
+
+    height = min(COMPLEXITY_REFERENCE["height"], media_info.height - media_info.height % 2)
+    sample_length = min(COMPLEXITY_SAMPLE_LENGTH, media_info.duration)
+    positions = [
+        (media_info.duration - sample_length) * (index + 1) / (COMPLEXITY_SAMPLES + 1)
+        for index in range(COMPLEXITY_SAMPLES)
+    ]
+
+    with tempfile.TemporaryDirectory(prefix="videoflix-complexity-") as sample_dir:
+        sample_bytes = sum(
+            encode_complexity_sample(video.video_file.path, position, sample_length, height, sample_dir, index)
+            for index, position in enumerate(positions)
+        )
+
+    sample_bitrate = sample_bytes * 8 / 1000 / (sample_length * len(positions))
+    factor = sample_bitrate / get_reference_bitrate(media_info, height)
+
+    media_info.complexity_factor = round(min(max(factor, COMPLEXITY_FACTOR_RANGE[0]), COMPLEXITY_FACTOR_RANGE[1]), 3)
+    media_info.save(update_fields=["complexity_factor"])
+
+    logger.info(
+        f"Complexity of {video.title}: {sample_bitrate:.0f} kbit/s at CRF {COMPLEXITY_CRF}, factor {factor:.2f}"
+    )
+    return media_info.complexity_factor
+
+
+def encode_complexity_sample(input_path, position, length, height, sample_dir, index):
+    """Encode one sample without audio at the constant quality target and return its size in bytes."""
+    sample_path = os.path.join(sample_dir, f"sample_{index}.mp4")
+    (
+        ffmpeg.input(input_path, ss=position, t=length)
+        .output(
+            sample_path,
+            vf=f"scale=-2:{height},setsar=1",
+            vcodec="libx264",
+            crf=COMPLEXITY_CRF,
+            preset="veryfast",
+            an=None,
+        )
+        .overwrite_output()
+        .run(quiet=True)
+    )
+    return os.path.getsize(sample_path)
+
+
+def get_reference_bitrate(media_info, height):
+    """Ladder bitrate in kbit/s for the sample size, scaled by pixel count and raised for high frame rates."""
+    width = height * media_info.width / media_info.height
+    bitrate = (
+        COMPLEXITY_REFERENCE["bitrate"]
+        * width
+        * height
+        / (COMPLEXITY_REFERENCE["width"] * COMPLEXITY_REFERENCE["height"])
+    )
+
+    if media_info.frame_rate and media_info.frame_rate > 30:
+        bitrate *= 1.5
+
+    return bitrate
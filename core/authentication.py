@@ -1,4 +1,28 @@
-from rest_framework_simplejwt.authentication import JWTAuthentication
+import logging
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework_simplejwt.authentication import JWTAuthentication, JWTStatelessUserAuthentication
+from rest_framework_simplejwt.settings import api_settings
+
+
+logger = logging.getLogger(__name__)
+
+
+# Cached instead of the user object, which would include the password hash
+USER_CACHE_FIELDS = (api_settings.USER_ID_FIELD, "is_active", "is_staff")
+
+
+def get_user_cache_key(user_id):
+    return f"auth-user:{user_id}"
+
+
+def invalidate_cached_user(user_id):
+    """Drop the cached user of the authentication backend."""
+    try:
+        cache.delete(get_user_cache_key(user_id))
+    except Exception as e:
+        logger.warning(f"Could not invalidate cached user {user_id}: {e}")
 
 
 class CookieJWTAuthentication(JWTAuthentication):
@@ -12,3 +36,45 @@ class CookieJWTAuthentication(JWTAuthentication):
             return self.get_user(validated_token), validated_token
         except Exception:
             return None
+
+    def get_user(self, validated_token):
+        """
+        Resolve the user of a token through the cache keyed by user id, so only a cache miss
+        queries the database. Only USER_CACHE_FIELDS are cached, a cached user is a partial
+        instance with just these fields and must not be saved. auth_app.signals invalidates it.
+        """
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        if user_id is None:
+            return super().get_user(validated_token)
+
+        cache_key = get_user_cache_key(user_id)
+        try:
+            cached_user = cache.get(cache_key)
+        except Exception as e:
+            logger.warning(f"User cache unavailable: {e}")
+            return super().get_user(validated_token)
+
+        # Inactive users are not served from the cache, the database lookup rejects them
+        if cached_user is not None and cached_user["is_active"]:
+            return self.user_model(**cached_user)
+
+        user = super().get_user(validated_token)
+        try:
+            cache.set(
+                cache_key,
+                {field: getattr(user, field) for field in USER_CACHE_FIELDS},
+                settings.AUTH_USER_CACHE_TIMEOUT,
+            )
+        except Exception as e:
+            logger.warning(f"User cache unavailable: {e}")
+
+        return user
+
+
+class StatelessCookieJWTAuthentication(CookieJWTAuthentication):
+    """
+    Cookie JWT authentication without the user query, the user is a TokenUser built from the
+    token claims. Meant for hot read paths like HLS segments.
+    """
+
+    get_user = JWTStatelessUserAuthentication.get_user
@@ -120,16 +120,60 @@ CACHES = {
     }
 }
 
+RQ_CONNECTION = {
+    "HOST": env("REDIS_HOST", default="redis"),
+    "PORT": env("REDIS_PORT", default=6379),
+    "DB": env("REDIS_DB", default=0),
+    "REDIS_CLIENT_KWARGS": {},
+}
+
+# "transcode": long ffmpeg encodes, "media": ingest, thumbnails and playlists, "mail": account emails
 RQ_QUEUES = {
-    "default": {
-        "HOST": env("REDIS_HOST", default="redis"),
-        "PORT": env("REDIS_PORT", default=6379),
-        "DB": env("REDIS_DB", default=0),
-        "DEFAULT_TIMEOUT": 14400,
-        "REDIS_CLIENT_KWARGS": {},
-    },
+    "default": {**RQ_CONNECTION, "DEFAULT_TIMEOUT": 14400},
+    "transcode": {**RQ_CONNECTION, "DEFAULT_TIMEOUT": 14400},
+    "media": {**RQ_CONNECTION, "DEFAULT_TIMEOUT": 900},
+    "mail": {**RQ_CONNECTION, "DEFAULT_TIMEOUT": 120},
 }
 
+# Number of workers started per queue by the rqworker_pools command
+RQ_WORKER_POOLS = {
+    "transcode": env.int("RQ_TRANSCODE_WORKERS", default=1),
+    "media": env.int("RQ_MEDIA_WORKERS", default=2),
+    "mail": env.int("RQ_MAIL_WORKERS", default=1),
+    "default": env.int("RQ_DEFAULT_WORKERS", default=1),
+}
+
+# Configs for video processing
+# "sequential": one ffmpeg run per resolution
+# "single_pass": decode the source once and write every resolution in one ffmpeg run
+# "parallel": one RQ job per resolution, a finalizer job writes the master playlist
+# "chunked": one RQ job per resolution and time range of VIDEO_CHUNK_DURATION seconds, stitched per resolution
+VIDEO_TRANSCODE_MODE = env("VIDEO_TRANSCODE_MODE", default="sequential")
+VIDEO_CHUNK_DURATION = env.int("VIDEO_CHUNK_DURATION", default=120)
+# Scale the ladder bitrates by a complexity factor measured with constant quality sample encodes
+VIDEO_PER_TITLE_ENCODING = env.bool("VIDEO_PER_TITLE_ENCODING", default=False)
+# "mpegts": one .ts file per segment
+# "fmp4": CMAF segments packed into one file per resolution, addressed with EXT-X-BYTERANGE
+VIDEO_HLS_SEGMENT_FORMAT = env("VIDEO_HLS_SEGMENT_FORMAT", default="mpegts")
+# Encode the audio once as its own rendition, published as an EXT-X-MEDIA audio group (always on for "chunked")
+VIDEO_HLS_SHARED_AUDIO = env.bool("VIDEO_HLS_SHARED_AUDIO", default=False)
+# Tiled seek preview sprites plus a WebVTT index, one frame every VIDEO_TRICKPLAY_INTERVAL seconds
+VIDEO_TRICKPLAY = env.bool("VIDEO_TRICKPLAY", default=True)
+VIDEO_TRICKPLAY_INTERVAL = env.int("VIDEO_TRICKPLAY_INTERVAL", default=10)
+# Largest file accepted by the chunked upload API in bytes (default 20 GiB)
+VIDEO_UPLOAD_MAX_SIZE = env.int("VIDEO_UPLOAD_MAX_SIZE", default=20 * 1024**3)
+
+# Delivery of HLS segments and trickplay files after the authorization check
+# "django": stream the file from the worker (development)
+# "x-accel-redirect": nginx serves HLS_ACCEL_REDIRECT_PREFIX + path relative to MEDIA_ROOT/hls from an internal location
+# "x-sendfile": Apache / lighttpd serve the absolute file path
+HLS_DELIVERY_MODE = env("HLS_DELIVERY_MODE", default="django")
+HLS_ACCEL_REDIRECT_PREFIX = env("HLS_ACCEL_REDIRECT_PREFIX", default="/protected-hls/")
+# "wsgi": gunicorn sync workers, "asgi": uvicorn workers serving HLS playlists and segments with async views
+SERVER_PROFILE = env("SERVER_PROFILE", default="wsgi")
+# Seconds a signed playback token from the start-playback endpoint stays valid for HLS requests
+PLAYBACK_TOKEN_LIFETIME = env.int("PLAYBACK_TOKEN_LIFETIME", default=6 * 60 * 60)
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
@@ -190,6 +234,9 @@ CORS_ALLOWED_ORIGINS = env.list("CORS_ALLOWED_ORIGINS", default=["http://127.0.0
 
 CORS_ALLOW_CREDENTIALS = True
 
+# Seconds a user resolved from an access token is cached by CookieJWTAuthentication
+AUTH_USER_CACHE_TIMEOUT = env.int("AUTH_USER_CACHE_TIMEOUT", default=60)
+
 SIMPLE_JWT = {
     "ACCESS_TOKEN_LIFETIME": timedelta(minutes=5),
     "REFRESH_TOKEN_LIFETIME": timedelta(days=1),
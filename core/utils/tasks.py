@@ -1,12 +1,22 @@
 from django.db import transaction
 import django_rq
-from rq import Retry
+from rq import Retry, get_current_job
 
 DEFAULT_RETRY = Retry(max=3, interval=[10, 30, 60])  # Retry nach 10s, 30s, 60s
+TRANSCODE_RETRY = Retry(max=2, interval=[60, 600])  # Retry nach 1min, 10min
+MAIL_RETRY = Retry(max=5, interval=[5, 30, 60, 300, 900])  # Retry nach 5s bis 15min
 
 
-def enqueue_after_commit(task, *args, retry=DEFAULT_RETRY, **kwargs):
+def enqueue_after_commit(task, *args, **kwargs):
     """
-    Queue a Task after DB-Commit, with Retry.
+    Queue a Task after DB-Commit on the queue, timeout and retry policy of its @job decorator.
     """
-    transaction.on_commit(lambda: django_rq.enqueue(task, *args, retry=retry, **kwargs))
+    transaction.on_commit(lambda: task.delay(*args, **kwargs))
+
+
+def is_last_attempt():
+    """
+    Check whether the running job has no retries left. Called outside a worker the call is the only attempt.
+    """
+    job = get_current_job()
+    return job is None or not job.retries_left